@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+Benchmark the stages of the regroup analysis on synthetic geometry.
+
+For every combination of crystal, frame count, and hmax, synthetic .inp
+and stills .expt files are written to a scratch directory and each stage
+is timed (best of --repeat) and run once more under tracemalloc for its
+peak Python/numpy memory. The .expt file is read both with the JSON
+reader regroup uses by default and, if dxtbx is installed, through dxtbx. Results are written as JSON with --save, and
+compared against a stored baseline with --compare; the comparison fails
+(exit code 1) if a stage is more than --tolerance slower or larger.
+
+Startup time and lazy imports are checked separately by startup.py.
+
+Example
+-------
+python benchmarks/analysis.py --frames 10 1000 100000 --hmax 1 2 3 --save baseline.json
+python benchmarks/analysis.py --frames 10 1000 100000 --hmax 1 2 3 --compare baseline.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from synthetic import CRYSTALS, write_inp_set, write_stills_expt
+from regroup import ExptList, FrameGeometry
+from regroup.regroup import (
+    analyze_facets,
+    compute_facet_angles,
+    get_spacegroups,
+    load_geometry,
+    stream_facet_stats,
+)
+from regroup.geom_utils import generate_facets
+from regroup.subgrouptable import get_subgroup_table
+
+EFVECTOR = np.array([0.0, 1.0, 0.0])
+
+
+def measure(func, repeat):
+    """
+    Best-of-`repeat` wall time of `func()` in seconds, and the peak traced
+    memory of one more call in bytes.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def read_expt_dxtbx(expt):
+    """
+    Frame geometry of `expt` as `load_geometry` returns it, read through dxtbx.
+    """
+    expts = ExptList(expt, use_dxtbx=True)
+    return expts.get_reciprocal_Amatrices(), expts.get_image_filenames(), expts.get_orthogonalization_matrix().T
+
+
+def stages(paths, expt, spacegroup, hmax):
+    """
+    Named benchmark stages for one synthetic data set. The dxtbx stage is
+    left out if dxtbx is not installed.
+    """
+    Astars, images, O = load_geometry(paths)
+    facets = [tuple(f) for f in generate_facets(hmax, O=O)]
+
+    def subgroups():
+        get_subgroup_table.cache_clear()
+        get_spacegroups(facets, spacegroup, O)
+
+    named = {
+        "FrameGeometry.readINPFile": lambda: [FrameGeometry(p) for p in paths],
+        "read_inp_files": lambda: load_geometry(paths),
+        "read_expt_stills": lambda: load_geometry([expt]),
+        "ExptList(use_dxtbx=True)": lambda: read_expt_dxtbx(expt),
+        "compute_facet_angles": lambda: compute_facet_angles(facets, Astars, EFVECTOR, O),
+        "stream_facet_stats": lambda: stream_facet_stats(facets, Astars, EFVECTOR, O),
+        "get_spacegroups": subgroups,
+        "analyze_facets": lambda: analyze_facets(paths, spacegroup, hmax=hmax, efvector=EFVECTOR),
+    }
+    if importlib.util.find_spec("dxtbx") is None:
+        del named["ExptList(use_dxtbx=True)"]
+    return named
+
+
+def run(crystals, frames, hmaxes, repeat, workdir, skip=()):
+    records = []
+    for name in crystals:
+        cell, spacegroup = CRYSTALS[name]
+        for n_frames in frames:
+            directory = os.path.join(workdir, f"{name}_{n_frames}")
+            paths = write_inp_set(directory, n_frames, cell, spacegroup)
+            expt = os.path.join(directory, "stills.expt")
+            write_stills_expt(expt, n_frames, cell)
+
+            for hmax in hmaxes:
+                for stage, func in stages(paths, expt, spacegroup, hmax).items():
+                    if stage in skip:
+                        continue
+                    seconds, peak = measure(func, repeat)
+                    record = {
+                        "crystal": name,
+                        "spacegroup": spacegroup,
+                        "frames": n_frames,
+                        "hmax": hmax,
+                        "stage": stage,
+                        "seconds": seconds,
+                        "peak_bytes": peak,
+                    }
+                    records.append(record)
+                    print(
+                        f"{name:12s} {n_frames:7d} {hmax:3d} {stage:26s} "
+                        f"{seconds:9.4f} s {peak / 2**20:9.2f} MB",
+                        flush=True,
+                    )
+    return records
+
+
+def _key(record):
+    return (record["crystal"], record["frames"], record["hmax"], record["stage"])
+
+
+def compare(records, baseline, tolerance):
+    """
+    Print the change of every record relative to `baseline`, and return
+    whether any stage regressed by more than `tolerance`.
+    """
+    base = {_key(r): r for r in baseline}
+    regressed = False
+    for record in records:
+        old = base.get(_key(record))
+        if old is None:
+            continue
+        for field in ("seconds", "peak_bytes"):
+            if old[field] <= 0:
+                continue
+            ratio = record[field] / old[field]
+            status = ""
+            if ratio > 1.0 + tolerance:
+                status = "  REGRESSION"
+                regressed = True
+            print(f"{' '.join(str(k) for k in _key(record)):60s} {field:10s} {ratio:6.2f}x{status}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "--crystals",
+        nargs="+",
+        default=list(CRYSTALS),
+        choices=list(CRYSTALS),
+        help="Synthetic crystals (cell and parent space group) to benchmark",
+    )
+    parser.add_argument(
+        "--frames",
+        nargs="+",
+        default=[10, 1000],
+        help="Frame counts of the synthetic data sets",
+        type=int,
+    )
+    parser.add_argument(
+        "--hmax",
+        nargs="+",
+        default=[1, 2],
+        help="Maximal Miller indices of the candidate facets",
+        type=int,
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        help="Number of timed runs per stage; the fastest is reported",
+        type=int,
+    )
+    parser.add_argument(
+        "--skip",
+        nargs="+",
+        default=[],
+        help="Stages to leave out, e.g. FrameGeometry.readINPFile for large frame counts",
+    )
+    parser.add_argument(
+        "--workdir",
+        default=None,
+        help="Directory for the synthetic files. Default: a temporary directory",
+    )
+    parser.add_argument("--save", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Compare the results against this JSON baseline")
+    parser.add_argument(
+        "--tolerance",
+        default=0.25,
+        help="Allowed fractional slowdown or memory growth relative to the baseline",
+        type=float,
+    )
+    args = parser.parse_args()
+
+    if args.workdir is None:
+        with tempfile.TemporaryDirectory() as workdir:
+            records = run(args.crystals, args.frames, args.hmax, args.repeat, workdir, args.skip)
+    else:
+        records = run(args.crystals, args.frames, args.hmax, args.repeat, args.workdir, args.skip)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": sys.version.split()[0], "numpy": np.__version__, "records": records}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["records"]
+        sys.exit(1 if compare(records, baseline, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
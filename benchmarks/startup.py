@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Measure regroup startup time and check that heavy backends stay lazy.
+
+Each command is run in a fresh interpreter. The check fails (exit code 1)
+if `import regroup.regroup` pulls in any of the heavy backends, or if the
+best-of-N time of a command exceeds --max-seconds.
+
+Example
+-------
+python benchmarks/startup.py --repeat 5 --max-seconds 1.0
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# Modules that `import regroup.regroup` and `regroup --help` must not import
+HEAVY_MODULES = ("pandas", "gemmi", "reciprocalspaceship", "dxtbx", "cctbx")
+
+COMMANDS = {
+    "import regroup": [sys.executable, "-c", "import regroup"],
+    "import regroup.regroup": [sys.executable, "-c", "import regroup.regroup"],
+    "regroup --help": [sys.executable, "-m", "regroup.regroup", "--help"],
+    "regroup.low_sym --help": [sys.executable, "-m", "regroup.low_sym", "--help"],
+    "regroup.pipeline --help": [sys.executable, "-m", "regroup.pipeline", "--help"],
+}
+
+
+def time_command(cmd, repeat):
+    """
+    Best-of-`repeat` wall time of `cmd` in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def eager_heavy_modules(module="regroup.regroup"):
+    """
+    Heavy backends imported by `import <module>` in a fresh interpreter.
+    """
+    code = (
+        "import sys\n"
+        f"import {module}\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    return out.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "--repeat",
+        default=5,
+        help="Number of runs per command; the fastest is reported",
+        type=int,
+    )
+    parser.add_argument(
+        "--max-seconds",
+        default=None,
+        help="Fail if any command takes longer than this",
+        type=float,
+    )
+    args = parser.parse_args()
+
+    failed = False
+
+    eager = eager_heavy_modules()
+    if eager:
+        print(f"FAIL: import regroup.regroup imports {', '.join(eager)}")
+        failed = True
+
+    for name, cmd in COMMANDS.items():
+        seconds = time_command(cmd, args.repeat)
+        status = ""
+        if args.max_seconds is not None and seconds > args.max_seconds:
+            status = f"  FAIL (> {args.max_seconds:.3f} s)"
+            failed = True
+        print(f"{name:28s} {seconds:8.3f} s{status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
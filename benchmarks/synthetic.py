@@ -0,0 +1,147 @@
+"""
+Synthetic frame geometry for the benchmarks.
+
+Writes Precognition .inp sets and DIALS-style stills .expt files for a
+crystal in a random orientation that wobbles slightly from frame to frame,
+as in a still-image series.
+"""
+
+import json
+import os
+import numpy as np
+from regroup.framegeometry import get_orthogonalization_matrix
+
+# name: (cell, parent space group number)
+CRYSTALS = {
+    "triclinic": ((34.2, 45.1, 52.7, 81.3, 76.9, 68.4), 1),
+    "monoclinic": ((42.3, 41.1, 72.5, 90.0, 104.2, 90.0), 4),
+    "orthorhombic": ((59.3, 70.1, 84.6, 90.0, 90.0, 90.0), 19),
+    "tetragonal": ((79.1, 79.1, 38.2, 90.0, 90.0, 90.0), 96),
+    "trigonal": ((103.4, 103.4, 124.9, 90.0, 90.0, 120.0), 146),
+    "cubic": ((102.6, 102.6, 102.6, 90.0, 90.0, 90.0), 221),
+}
+
+_INP_TAIL = (
+    "   Format     RayonixMX340\n"
+    "   Distance   250.0 0.05\n"
+    "   Center     1985 1985 0.1 0.1\n"
+    "   Pixel      0.0886 0.0886\n"
+    "   Swing      0.0 0.0\n"
+    "   Tilt       0.0 0.0 0.0 0.0\n"
+    "   Bulge      0.0 0.0 0.0 0.0\n"
+    "\n"
+)
+
+
+def random_rotation(rng):
+    """
+    Uniformly distributed rotation matrix from a random unit quaternion.
+    """
+    a, b, c, d = rng.normal(size=4)
+    n = np.sqrt(a * a + b * b + c * c + d * d)
+    a, b, c, d = a / n, b / n, c / n, d / n
+    return np.array([
+        [a * a + b * b - c * c - d * d, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+        [2 * (b * c + a * d), a * a - b * b + c * c - d * d, 2 * (c * d - a * b)],
+        [2 * (b * d - a * c), 2 * (c * d + a * b), a * a - b * b - c * c + d * d],
+    ])
+
+
+def wobble(rng, n, scale=2e-3):
+    """
+    `n` small rotations of about `scale` radians (Rodrigues' formula).
+    """
+    w = rng.normal(scale=scale, size=(n, 3))
+    theta = np.linalg.norm(w, axis=1)
+    k = w / np.where(theta > 0, theta, 1.0)[:, None]
+    K = np.zeros((n, 3, 3))
+    K[:, 0, 1], K[:, 0, 2] = -k[:, 2], k[:, 1]
+    K[:, 1, 0], K[:, 1, 2] = k[:, 2], -k[:, 0]
+    K[:, 2, 0], K[:, 2, 1] = -k[:, 1], k[:, 0]
+    s, c = np.sin(theta)[:, None, None], np.cos(theta)[:, None, None]
+    return np.eye(3) + s * K + (1 - c) * (K @ K)
+
+
+def write_inp_set(directory, n_frames, cell, spacegroup, seed=0):
+    """
+    Write `n_frames` Precognition .inp files to `directory`.
+
+    Returns
+    -------
+    list of str
+        Paths of the written files, in frame order.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    U = wobble(rng, n_frames) @ random_rotation(rng)
+    omega = 30.0 + rng.normal(scale=0.05, size=(n_frames, 2))
+    phi = rng.normal(scale=0.05, size=n_frames)
+    crystal = " ".join(str(x) for x in cell)
+
+    paths = []
+    for i in range(n_frames):
+        path = os.path.join(directory, f"frame_{i:06d}.mccd.inp")
+        matrix = " ".join(f"{x:.6f}" for x in U[i].ravel())
+        with open(path, "w") as f:
+            f.write("Input\n")
+            f.write(f"   Crystal    {crystal} {spacegroup}\n")
+            f.write(f"   Matrix     {matrix}\n")
+            f.write(f"   Omega      {omega[i, 0]:.3f} {omega[i, 1]:.3f}\n")
+            f.write(f"   Goniometer 0.0 0.0 {phi[i]:.3f}\n\n")
+            f.write(_INP_TAIL)
+            f.write(f"   Image      frame_{i:06d}.mccd 0\n")
+            f.write("   Resolution 1.8 100\n   Wavelength 1.02 1.16\n   Quit\n")
+        paths.append(path)
+    return paths
+
+
+def write_stills_expt(path, n_frames, cell, seed=0):
+    """
+    Write a DIALS-style stills experiment list with `n_frames` crystals
+    and single-image imagesets.
+
+    Returns
+    -------
+    np.ndarray, shape (n_frames, 3, 3)
+        The A* matrix of each experiment.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # rows are the real-space a, b, c in the crystal Cartesian frame
+    basis = get_orthogonalization_matrix(*cell)
+    U = wobble(rng, n_frames) @ random_rotation(rng)
+    real_space = basis @ np.swapaxes(U, 1, 2)
+
+    crystals = [
+        {
+            "__id__": "crystal",
+            "real_space_a": M[0].tolist(),
+            "real_space_b": M[1].tolist(),
+            "real_space_c": M[2].tolist(),
+            "space_group_hall_symbol": " P 1",
+        }
+        for M in real_space
+    ]
+    imagesets = [
+        {"__id__": "ImageSet", "images": [f"frame_{i:06d}.cbf"], "mask": "", "gain": "", "pedestal": ""}
+        for i in range(n_frames)
+    ]
+    experiments = [
+        {"__id__": "Experiment", "identifier": str(i), "beam": 0, "detector": 0, "crystal": i, "imageset": i}
+        for i in range(n_frames)
+    ]
+    data = {
+        "__id__": "ExperimentList",
+        "experiment": experiments,
+        "imageset": imagesets,
+        "beam": [{"__id__": "Beam", "direction": [0.0, 0.0, 1.0], "wavelength": 1.0}],
+        "detector": [{"__id__": "detector", "panels": []}],
+        "goniometer": [],
+        "scan": [],
+        "crystal": crystals,
+        "profile": [],
+        "scaling_model": [],
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return np.linalg.inv(real_space)
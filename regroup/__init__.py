@@ -1,4 +1,22 @@
+import importlib
+
 from .framegeometry import FrameGeometry
-from .dialsgeometry import ExptList
 from .geom_utils import *
-from .low_sym import cctbx_cb_op_to_rs_op, _has_any
\ No newline at end of file
+
+# Names whose modules pull in heavy backends (dxtbx, gemmi) are imported
+# on first access, so that e.g. `regroup --help` does not pay for them.
+_LAZY_ATTRIBUTES = {
+    "ExptList": "regroup.dialsgeometry",
+    "cctbx_cb_op_to_rs_op": "regroup.low_sym",
+    "_has_any": "regroup.low_sym",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
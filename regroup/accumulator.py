@@ -0,0 +1,140 @@
+import numpy as np
+from regroup.geom_utils import fmt_vec
+
+
+class FacetAccumulator():
+    """
+    Running per-facet angle statistics with memory independent of the
+    number of frames.
+
+    Keeps a count, mean, and sum of squared deviations (M2) of the angle
+    for each facet, merged batch by batch with Welford/Chan updates, plus
+    a running sum of the crystal-frame field vector, both as given and
+    rounded per frame as in the printed table.
+    """
+
+    #-------------------------------------------------------------------#
+    # Constructor
+
+    def __init__(self, n_facets, ndigits=4):
+        self._count = np.zeros(n_facets, dtype=np.int64)
+        self._mean = np.zeros(n_facets)
+        self._M2 = np.zeros(n_facets)
+        self._ef_sum = np.zeros((n_facets, 3))
+        self._ef_sum_rounded = np.zeros((n_facets, 3))
+        self._ndigits = ndigits
+
+    #-------------------------------------------------------------------#
+    # Attributes
+
+    def __len__(self):
+        return len(self._count)
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        mean = self._mean.copy()
+        mean[self._count == 0] = np.nan
+        return mean
+
+    @property
+    def std(self):
+        """
+        Sample standard deviation (ddof=1); NaN for fewer than two frames.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = self._M2 / (self._count - 1)
+        var[self._count < 2] = np.nan
+        return np.sqrt(var)
+
+    @property
+    def ef_mean(self):
+        """
+        Mean crystal-frame field vector of each facet, (F, 3), not rounded.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self._ef_sum / self._count[:, None]
+
+    #-------------------------------------------------------------------#
+    # Update Methods
+
+    def update(self, angles, ef_cryst):
+        """
+        Add a batch of frames.
+
+        Parameters
+        ----------
+        angles : np.ndarray, shape (n, F)
+            Angles of every facet on each of n frames.
+        ef_cryst : np.ndarray, shape (n, 3)
+            Crystal-frame field vector of each frame.
+        """
+        angles = np.asarray(angles, dtype=float)
+        n_b = angles.shape[0]
+        if n_b == 0:
+            return
+        mean_b = angles.mean(axis=0)
+        M2_b = ((angles - mean_b)**2).sum(axis=0)
+
+        n_a = self._count
+        n = n_a + n_b
+        delta = mean_b - self._mean
+        self._mean += delta * n_b / n
+        self._M2 += M2_b + delta**2 * n_a * n_b / n
+        self._count = n
+
+        ef = np.asarray(ef_cryst, dtype=float)
+        self._ef_sum += ef.sum(axis=0)
+        # round as fmt_vec does for the per-row field vectors
+        self._ef_sum_rounded += np.round(ef, self._ndigits).sum(axis=0)
+        return
+
+    def update_pairs(self, facet_idx, angles, ef_cryst):
+        """
+        Add a batch of individual (frame, facet) observations.
+
+        Parameters
+        ----------
+        facet_idx : np.ndarray, shape (M,)
+            Facet index of each observation.
+        angles : np.ndarray, shape (M,)
+            Angle of each observation.
+        ef_cryst : np.ndarray, shape (M, 3)
+            Crystal-frame field vector of the frame of each observation.
+        """
+        facet_idx = np.asarray(facet_idx, dtype=int)
+        angles = np.asarray(angles, dtype=float)
+        if facet_idx.size == 0:
+            return
+        F = len(self)
+        n_b = np.bincount(facet_idx, minlength=F)
+        seen = n_b > 0
+        mean_b = np.zeros(F)
+        mean_b[seen] = np.bincount(facet_idx, weights=angles, minlength=F)[seen] / n_b[seen]
+        M2_b = np.bincount(facet_idx, weights=(angles - mean_b[facet_idx])**2, minlength=F)
+
+        n_a = self._count[seen]
+        n = n_a + n_b[seen]
+        delta = mean_b[seen] - self._mean[seen]
+        self._mean[seen] += delta * n_b[seen] / n
+        self._M2[seen] += M2_b[seen] + delta**2 * n_a * n_b[seen] / n
+        self._count[seen] = n
+
+        ef = np.asarray(ef_cryst, dtype=float)
+        ef_rounded = np.round(ef, self._ndigits)
+        for j in range(3):
+            self._ef_sum[:, j] += np.bincount(facet_idx, weights=ef[:, j], minlength=F)
+            self._ef_sum_rounded[:, j] += np.bincount(facet_idx, weights=ef_rounded[:, j], minlength=F)
+        return
+
+    def ef_mean_tuples(self):
+        """
+        Mean field vectors as rounded tuples, as in the long-form table:
+        the mean of the per-frame rounded vectors, rounded again.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ef_mean = self._ef_sum_rounded / self._count[:, None]
+        return [fmt_vec(v, ndigits=self._ndigits) for v in ef_mean]
@@ -1,36 +1,60 @@
+import json
 import os
+import re
 import numpy as np
-from dxtbx.model import ExperimentList
+from regroup.framegeometry import get_orthogonalization_matrix
 
 class ExptList():
     """
     Reads a DIALS experiment file and contains functions for parsing data inside.
+
+    Stills files are read with a lightweight JSON reader that only extracts
+    the crystal real-space vectors and image filenames. Anything that reader
+    does not understand, and any access to the dxtbx models, goes through
+    dxtbx.
     """
 
     #-------------------------------------------------------------------#
     # Constructor
-    
-    def __init__(self, exptfile):
-        self.readExptFile(exptfile)
+
+    def __init__(self, exptfile, use_dxtbx=False):
+        self._exptfile = exptfile
+        self._elist = None
+        self._fast = None
+        if not use_dxtbx:
+            if not os.path.exists(exptfile):
+                raise ValueError(f"Cannot find file: {exptfile}")
+            try:
+                self._fast = read_expt_stills(exptfile)
+            except UnsupportedExptFile:
+                self._fast = None
+        if self._fast is None:
+            self.readExptFile(exptfile)
 
     #-------------------------------------------------------------------#
     # Attributes
-    
+
     @property
     def elist(self):
+        if self._elist is None:
+            self.readExptFile(self._exptfile)
         return self._elist
 
     @property
     def crystals(self):
+        if self._elist is None:
+            self.readExptFile(self._exptfile)
         return self._crystals
 
     @property
     def images(self):
+        if self._elist is None:
+            self.readExptFile(self._exptfile)
         return self._images
 
     #-------------------------------------------------------------------#
     # I/O Methods
-    
+
     def readExptFile(self, exptfile):
         """
         Read Precognition .inp file and update geometric attributes
@@ -49,6 +73,7 @@ class ExptList():
             raise ValueError(f"Cannot find file: {exptfile}")
 
         # Create ExperimentList from file
+        from dxtbx.model import ExperimentList
         elist = ExperimentList.from_file(exptfile, check_format=False)
 
         # Check that experiments are stills
@@ -59,10 +84,12 @@ class ExptList():
         self._crystals = elist.crystals()
         self._images = elist.imagesets()
         return
-            
+
     #-------------------------------------------------------------------#
     # Crystallographic Methods
     def get_image_filenames(self):
+        if self._fast is not None:
+            return list(self._fast["images"])
         imgs = self.images
         image_filenames = []
         for img in imgs:
@@ -73,6 +100,8 @@ class ExptList():
         """
         Compute real-space orthogonalization matrix from unit cell parameters.
         """
+        if self._fast is not None:
+            return get_orthogonalization_matrix(*self._fast["cell"])
         cryst = self.crystals[0]
         cell = cryst.get_unit_cell()
         O = np.reshape(cell.orthogonalization_matrix(), (3,3))
@@ -82,8 +111,237 @@ class ExptList():
         """
         Get A matrix in reciprocal lattice basis (A*)
         """
+        if self._fast is not None:
+            return self._fast["Astars"]
         crystals = self.crystals
         A_stars = []
         for cryst in crystals:
             A_stars.append(np.reshape(cryst.get_A(), (3,3)))
         return A_stars
+
+#-----------------------------------------------------------------------#
+# Lightweight reader
+
+class UnsupportedExptFile(ValueError):
+    """
+    Raised by `read_expt_stills` for files it cannot interpret.
+    """
+
+_IMAGESET_IDS = ("ImageSet",)
+
+def _keep_needed(obj):
+    """
+    json object_hook keeping only the fields read_expt_stills needs. Other
+    models (beams, detectors, profiles, ...) are dropped as they are decoded.
+    """
+    kind = obj.get("__id__")
+    if kind is None or kind == "ExperimentList":
+        return obj
+    if kind == "Experiment":
+        keys = ("crystal", "imageset", "scan")
+        return {"__id__": kind, **{k: obj.get(k) for k in keys}}
+    if kind == "crystal":
+        keys = ("real_space_a", "real_space_b", "real_space_c")
+        return {"__id__": kind, **{k: obj.get(k) for k in keys}}
+    if kind in _IMAGESET_IDS:
+        return {"__id__": kind, "images": obj.get("images", [])[:1]}
+    return {"__id__": kind}
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+class _JSONStream():
+    """
+    Reads JSON values one at a time from a text file through a bounded
+    buffer, with `json.JSONDecoder.raw_decode`.
+
+    Only the value being decoded, and not the file, has to fit in the
+    buffer; a value spanning reads is retried with twice as much text.
+    """
+
+    def __init__(self, f, object_hook=None, block_size=1 << 20):
+        self._f = f
+        self._decoder = json.JSONDecoder(object_hook=object_hook)
+        self._block_size = block_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size):
+        block = self._f.read(size)
+        self._buf = self._buf[self._pos:] + block
+        self._pos = 0
+        self._eof = not block
+        return not self._eof
+
+    def peek(self):
+        """
+        Next non-whitespace character, or '' at the end of the file.
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self._block_size):
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON at offset {self._pos}")
+        self._pos += 1
+
+    def value(self):
+        """
+        Decode the next JSON value.
+        """
+        self.peek()
+        size = self._block_size
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+                # a value ending with the buffer, e.g. a number, may continue
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+def _read_json_object(f, object_hook=None, block_size=1 << 20):
+    """
+    Decode a JSON object from `f` member by member, and the elements of
+    array members one by one, so that `object_hook` can drop unneeded
+    fields before the next element is read. Peak memory is the kept data
+    plus about `block_size` characters and the largest element.
+    """
+    stream = _JSONStream(f, object_hook=object_hook, block_size=block_size)
+    data = {}
+    stream.expect("{")
+    if stream.peek() == "}":
+        return data
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if stream.peek() == "[":
+            stream.expect("[")
+            items = []
+            if stream.peek() != "]":
+                while True:
+                    items.append(stream.value())
+                    if stream.peek() != ",":
+                        break
+                    stream.expect(",")
+            stream.expect("]")
+            data[key] = items
+        else:
+            data[key] = stream.value()
+        if stream.peek() != ",":
+            break
+        stream.expect(",")
+    stream.expect("}")
+    return data
+
+def _unit_cell(a, b, c):
+    """
+    Unit cell parameters from real-space basis vectors.
+    """
+    def _angle(u, v):
+        return np.rad2deg(np.arccos(np.dot(u, v) / (np.linalg.norm(u) * np.linalg.norm(v))))
+
+    return (
+        np.linalg.norm(a), np.linalg.norm(b), np.linalg.norm(c),
+        _angle(b, c), _angle(a, c), _angle(a, b),
+    )
+
+def read_expt_stills(exptfile, block_size=1 << 20):
+    """
+    Read A* matrices and image filenames from a DIALS stills .expt file
+    without dxtbx.
+
+    The JSON is decoded incrementally, one experiment, crystal, or
+    imageset at a time, and only `real_space_a/b/c` of each crystal, the
+    crystal and imageset index of each experiment, and the first image of
+    each imageset are kept; all other models are dropped as they are
+    decoded. Peak memory therefore does not grow with the file text.
+
+    Parameters
+    ----------
+    exptfile : str
+        Path to .expt file from which to read.
+    block_size : int
+        Characters read from the file at a time
+
+    Returns
+    -------
+    dict
+        "Astars" : np.ndarray, shape (N, 3, 3), one per experiment
+        "images" : list of str, one per experiment
+        "cell" : tuple of the unit cell parameters of the first crystal
+
+    Raises
+    ------
+    UnsupportedExptFile
+        If the file is not a stills experiment list in the expected layout,
+        e.g. scans, shared crystals or imagesets, or external model files.
+    """
+    try:
+        with open(exptfile, "r") as f:
+            data = _read_json_object(f, object_hook=_keep_needed, block_size=block_size)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise UnsupportedExptFile(f"{exptfile} is not a JSON experiment list") from e
+
+    if not isinstance(data, dict) or data.get("__id__") != "ExperimentList":
+        raise UnsupportedExptFile(f"{exptfile} is not a JSON experiment list")
+
+    experiments = data.get("experiment") or []
+    crystals = data.get("crystal") or []
+    imagesets = data.get("imageset") or []
+    if not experiments:
+        raise UnsupportedExptFile(f"{exptfile} has no experiments")
+
+    try:
+        i_cryst = np.array([e["crystal"] for e in experiments], dtype=int)
+        i_imset = np.array([e["imageset"] for e in experiments], dtype=int)
+    except (TypeError, ValueError) as e:
+        raise UnsupportedExptFile(f"{exptfile} has experiments without model indices") from e
+
+    # stills: no scans, and one crystal and one imageset per experiment
+    if any(e.get("scan") is not None for e in experiments):
+        raise UnsupportedExptFile(f"{exptfile} has scans")
+    if len(np.unique(i_cryst)) != len(experiments) or len(np.unique(i_imset)) != len(experiments):
+        raise UnsupportedExptFile(f"{exptfile} has shared crystals or imagesets")
+    if i_cryst.min() < 0 or i_cryst.max() >= len(crystals):
+        raise UnsupportedExptFile(f"{exptfile} has out-of-range crystal indices")
+    if i_imset.min() < 0 or i_imset.max() >= len(imagesets):
+        raise UnsupportedExptFile(f"{exptfile} has out-of-range imageset indices")
+
+    try:
+        real_space = np.array(
+            [[crystals[i][k] for k in ("real_space_a", "real_space_b", "real_space_c")] for i in i_cryst],
+            dtype=float,
+        )
+    except (TypeError, ValueError) as e:
+        raise UnsupportedExptFile(f"{exptfile} has crystals without real-space vectors") from e
+    if real_space.shape != (len(experiments), 3, 3):
+        raise UnsupportedExptFile(f"{exptfile} has malformed real-space vectors")
+
+    images = []
+    dirname = os.path.dirname(os.path.abspath(exptfile))
+    for i in i_imset:
+        imageset = imagesets[i]
+        if imageset.get("__id__") not in _IMAGESET_IDS or not imageset.get("images"):
+            raise UnsupportedExptFile(f"{exptfile} has an imageset of unsupported type")
+        image = imageset["images"][0]
+        if not os.path.isabs(image):
+            image = os.path.join(dirname, image)
+        images.append(image)
+
+    # A = UB is the inverse of the matrix with rows a, b, c
+    Astars = np.linalg.inv(real_space)
+
+    return {
+        "Astars": Astars,
+        "images": images,
+        "cell": _unit_cell(*real_space[0]),
+    }
@@ -0,0 +1,87 @@
+import numpy as np
+from regroup.geom_utils import facet_normals_to_crystal_frame
+
+
+class FacetIndex():
+    """
+    Spatial index of unit facet normals in the crystal Cartesian frame.
+
+    Facet normals are converted once with `facet_normals_to_crystal_frame`
+    and O, and stored in a KD-tree on the unit sphere. Field vectors in
+    crystal fractional coordinates (from `lab_vec_to_crystal`) can then be
+    matched to the facets within an angular radius in time sublinear in
+    the number of facets. scipy is only needed for this index.
+    """
+
+    #-------------------------------------------------------------------#
+    # Constructor
+
+    def __init__(self, facets, O):
+        from scipy.spatial import cKDTree
+
+        self._facets = np.asarray(facets, dtype=int).reshape(-1, 3)
+        self._O = np.asarray(O, dtype=float)
+        self._normals = self.to_cartesian(facet_normals_to_crystal_frame(self._facets, self._O))
+        self._tree = cKDTree(self._normals)
+
+    #-------------------------------------------------------------------#
+    # Attributes
+
+    def __len__(self):
+        return len(self._facets)
+
+    @property
+    def facets(self):
+        return self._facets
+
+    @property
+    def normals(self):
+        return self._normals
+
+    #-------------------------------------------------------------------#
+    # Query Methods
+
+    def to_cartesian(self, v_frac):
+        """
+        Convert (N, 3) fractional-coordinate vectors to unit vectors in the
+        crystal Cartesian frame.
+        """
+        v = np.asarray(v_frac, dtype=float).reshape(-1, 3) @ self._O.T
+        return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+    def _angles(self, v_cart, facet_idx):
+        cosang = np.einsum("...i,...i->...", self._normals[facet_idx], v_cart)
+        return np.degrees(np.arccos(np.clip(cosang, -1.0, 1.0)))
+
+    def query_radius(self, ef_cryst, max_angle):
+        """
+        Find all facets within `max_angle` degrees of each field vector.
+
+        Parameters
+        ----------
+        ef_cryst : array_like, shape (N, 3)
+            Field vectors in crystal fractional coordinates.
+        max_angle : float
+            Angular radius in degrees.
+
+        Returns
+        -------
+        frames : np.ndarray, shape (M,)
+            Index of the field vector of each hit.
+        facet_idx : np.ndarray, shape (M,)
+            Index into `facets` of each hit.
+        angles : np.ndarray, shape (M,)
+            Crystal-frame angle of each hit in degrees.
+        """
+        v = self.to_cartesian(ef_cryst)
+        # chord length on the unit sphere for the angular radius
+        radius = 2.0 * np.sin(np.deg2rad(min(max_angle, 180.0)) / 2.0)
+        hits = self._tree.query_ball_point(v, radius, return_sorted=False)
+
+        counts = np.fromiter((len(h) for h in hits), dtype=int, count=len(hits))
+        frames = np.repeat(np.arange(len(hits)), counts)
+        facet_idx = np.concatenate([np.asarray(h, dtype=int) for h in hits]) if counts.sum() else np.array([], dtype=int)
+        angles = self._angles(v[frames], facet_idx)
+
+        keep = angles <= max_angle
+        return frames[keep], facet_idx[keep], angles[keep]
@@ -1,5 +1,7 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
+from regroup.profiling import stage
 
 class FrameGeometry():
     """
@@ -9,6 +11,12 @@ class FrameGeometry():
     for reading and writing Precognition .inp geometry files. 
     """
 
+    __slots__ = (
+        "_crystal", "_spacegroup", "_matrix", "_omega", "_goniometer",
+        "_imageformat", "_distance", "_center", "_pixel", "_swing",
+        "_tilt", "_bulge", "_image", "_resolution", "_wavelength",
+    )
+
     #-------------------------------------------------------------------#
     # Constructor
     
@@ -17,6 +25,27 @@ class FrameGeometry():
         self.image = None
         self.readINPFile(inpfile)
 
+    @classmethod
+    def from_record(cls, record, inpfile=None):
+        """
+        Lightweight FrameGeometry from one row of `read_inp_batch`.
+
+        Only the crystal, matrix, omega, and goniometer fields are set, as
+        float arrays; the detector fields are None. This is enough for the
+        crystallographic methods but not for `writeINPFile`.
+        """
+        geometry = cls.__new__(cls)
+        for slot in cls.__slots__:
+            setattr(geometry, slot, None)
+        geometry.crystal = record["crystal"]
+        geometry.spacegroup = record["spacegroup"]
+        geometry.matrix = record["matrix"]
+        geometry.omega = record["omega"]
+        if not np.isnan(record["goniometer"]).any():
+            geometry.goniometer = record["goniometer"]
+        geometry.image = inpfile
+        return geometry
+
     #-------------------------------------------------------------------#
     # Attributes
         
@@ -350,6 +379,12 @@ class FrameGeometry():
         R = get_rotation_matrix((R@np.array([0., 1., 0.])[:,None])[:,0], gonio_phi)@R
         return R
 
+    def get_orthogonalization_matrix(self):
+        """
+        Get orthogonalization matrix for the unit cell of FrameGeometry
+        """
+        return get_orthogonalization_matrix(*self.crystal)
+
     def get_reciprocal_Amatrix(self):
         """
         Get A matrix in reciprocal lattice basis (A*)
@@ -405,3 +440,232 @@ def get_orthogonalization_matrix(a, b, c, alpha, beta, gamma):
     O[2, 2] = V/(a*b*np.sin(gamma))
 
     return O.T
+
+
+#-----------------------------------------------------------------------#
+# Batched Crystallographic Methods
+
+def _get_rotation_matrices(axes, angles):
+    """
+    Rodrigues rotations about (N, 3) unit `axes` by (N,) `angles` in radians,
+    with the sign convention of FrameGeometry.get_goniometer_rotation_matrix.
+    """
+    u = np.broadcast_to(np.asarray(axes, dtype=float), (len(angles), 3))
+    sin = np.sin(angles)[:, None, None]
+    cos = np.cos(angles)[:, None, None]
+    cross = np.cross(u[:, None, :], -np.eye(3))
+    return cos*np.eye(3) + sin*cross + (1. - cos)*np.einsum("ni,nj->nij", u, u)
+
+def get_goniometer_rotation_matrices(omega, gonio_phi):
+    """
+    Get goniometer rotation matrices for N frames.
+
+    Parameters
+    ----------
+    omega : array_like, shape (N, 2)
+        Omega settings in degrees
+    gonio_phi : array_like, shape (N,)
+        Goniometer phi settings in degrees
+
+    Returns
+    -------
+    np.ndarray, shape (N, 3, 3)
+    """
+    omega = np.deg2rad(np.asarray(omega, dtype=float).reshape(-1, 2))
+    gonio_phi = np.deg2rad(np.asarray(gonio_phi, dtype=float).reshape(-1))
+
+    R = _get_rotation_matrices(np.array([0., 0., -1.]), omega[:, 0])
+    R = _get_rotation_matrices(np.array([0., 1., 0.]), omega[:, 1])@R
+    R = _get_rotation_matrices(R[:, :, 1], gonio_phi)@R
+    return R
+
+def get_reciprocal_Amatrices(crystal, missetting, omega, gonio_phi):
+    """
+    Get A matrices in reciprocal lattice basis (A*) for N frames.
+
+    Parameters
+    ----------
+    crystal : array_like, shape (6,) or (N, 6)
+        Unit cell parameters, shared or per frame. O is inverted once per
+        distinct cell.
+    missetting : array_like, shape (N, 3, 3)
+        Missetting matrices
+    omega : array_like, shape (N, 2)
+        Omega settings in degrees
+    gonio_phi : array_like, shape (N,)
+        Goniometer phi settings in degrees
+
+    Returns
+    -------
+    np.ndarray, shape (N, 3, 3)
+    """
+    missetting = np.asarray(missetting, dtype=float).reshape(-1, 3, 3)
+    gonio_phi = np.asarray(gonio_phi, dtype=float).reshape(-1)
+    if np.isnan(gonio_phi).any():
+        raise ValueError("Goniometer settings are required to compute A*")
+
+    crystal = np.asarray(crystal, dtype=float).reshape(-1, 6)
+    cells, which = np.unique(crystal, axis=0, return_inverse=True)
+    Oinv = np.stack([np.linalg.inv(get_orthogonalization_matrix(*cell)) for cell in cells])
+    Oinv = Oinv[which.reshape(-1)]
+
+    R = get_goniometer_rotation_matrices(omega, gonio_phi)
+    precog2mosflm = np.array(
+        [[  0,  0,  1],
+         [  0, -1,  0],
+         [  1,  0,  0]]
+    )
+    return precog2mosflm@(R@missetting@Oinv)
+
+#-----------------------------------------------------------------------#
+# Batch I/O
+
+# Record layout of `read_inp_batch`. Fields that are absent from a file
+# (e.g. Goniometer) are NaN.
+INP_DTYPE = np.dtype([
+    ("crystal", "f8", (6,)),
+    ("spacegroup", "i4"),
+    ("matrix", "f8", (9,)),
+    ("omega", "f8", (2,)),
+    ("goniometer", "f8", (3,)),
+])
+
+# .inp keys understood by FrameGeometry.readINPFile
+_INP_KEYS = {
+    "Crystal", "Matrix", "Omega", "Goniometer", "Format", "Distance",
+    "Center", "Pixel", "Swing", "Tilt", "Bulge", "Image", "Resolution",
+    "Wavelength",
+}
+
+def _parse_inp_into(records, i, inpfile):
+    """
+    Parse the crystal, matrix, omega, and goniometer fields of `inpfile`
+    directly into row `i` of `records`.
+    """
+    if not os.path.exists(inpfile):
+        raise ValueError(f"Cannot find file: {inpfile}")
+
+    with open(inpfile, "r") as inp:
+        lines = inp.read().splitlines()
+    if not (lines and "Input" in lines[0] and "Quit" in lines[-1]):
+        raise ValueError(f"{inpfile} does not meet formatting assumptions")
+
+    record = records[i]
+    found = set()
+    for l in lines[1:-1]:
+        fields = l.split()
+        if not fields:
+            continue
+        key = fields[0]
+        if key == "Crystal":
+            record["crystal"] = fields[1:-1]
+            record["spacegroup"] = fields[-1]
+        elif key == "Matrix":
+            record["matrix"] = fields[1:]
+        elif key == "Omega":
+            record["omega"] = fields[1:]
+        elif key == "Goniometer":
+            record["goniometer"] = fields[1:]
+        elif key not in _INP_KEYS:
+            raise ValueError(f"Unexpected key {key} in {inpfile}")
+        found.add(key)
+
+    missing = {"Crystal", "Matrix", "Omega"} - found
+    if missing:
+        raise ValueError(f"Missing {', '.join(sorted(missing))} in {inpfile}")
+    return
+
+def _read_inp_chunk(inpfiles):
+    records = np.zeros(len(inpfiles), dtype=INP_DTYPE)
+    records["goniometer"] = np.nan
+    for i, inpfile in enumerate(inpfiles):
+        _parse_inp_into(records, i, inpfile)
+    return records
+
+def _map_chunks(func, items, jobs=1, executor="thread"):
+    """
+    Apply `func` to contiguous chunks of `items` and return the results
+    in input order.
+    """
+    if jobs is None or jobs <= 1:
+        return [func(items)]
+
+    if executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=jobs)
+    elif executor == "process":
+        pool = ProcessPoolExecutor(max_workers=jobs)
+    else:
+        raise ValueError(f"Unknown executor {executor!r}; use 'thread' or 'process'")
+
+    # several chunks per worker, so a slow file does not stall a whole worker
+    n_chunks = min(len(items), 4 * jobs)
+    bounds = np.linspace(0, len(items), n_chunks + 1).astype(int)
+    chunks = [items[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    with pool:
+        return list(pool.map(func, chunks))
+
+def read_inp_batch(inpfiles, jobs=1, executor="thread"):
+    """
+    Read the crystal, matrix, omega, and goniometer fields of many
+    Precognition .inp files into one record array.
+
+    Parameters
+    ----------
+    inpfiles : list of str
+        Paths to .inp files
+    jobs : int
+        Number of workers. With 1, files are read in the calling thread.
+    executor : {"thread", "process"}
+        Use a thread pool (I/O-bound storage, e.g. network filesystems) or
+        a process pool (parsing-bound).
+
+    Returns
+    -------
+    np.ndarray
+        Record array with dtype `INP_DTYPE`, one row per file, in input
+        order.
+    """
+    inpfiles = list(inpfiles)
+    if not inpfiles:
+        return np.empty(0, dtype=INP_DTYPE)
+    return np.concatenate(_map_chunks(_read_inp_chunk, inpfiles, jobs=jobs, executor=executor))
+
+def read_inp_files(inpfiles, jobs=1, executor="thread"):
+    """
+    Read many Precognition .inp files, parsing each file once.
+
+    Parameters
+    ----------
+    inpfiles : list of str
+        Paths to .inp files
+    jobs : int
+        Number of workers. With 1, files are read in the calling thread.
+    executor : {"thread", "process"}
+        Use a thread pool (I/O-bound storage, e.g. network filesystems) or
+        a process pool (parsing-bound).
+
+    Returns
+    -------
+    Astars : np.ndarray, shape (N, 3, 3)
+        A* matrices, in input order
+    images : list of str
+        The input .inp files, in input order
+    O : np.ndarray, shape (3, 3)
+        Orthogonalization matrix of the first file, as returned by
+        `FrameGeometry.get_orthogonalization_matrix`
+    """
+    inpfiles = list(inpfiles)
+    if not inpfiles:
+        raise ValueError("No .inp files to read")
+
+    with stage("read_inp"):
+        records = read_inp_batch(inpfiles, jobs=jobs, executor=executor)
+    with stage("astar"):
+        Astars = get_reciprocal_Amatrices(
+            records["crystal"],
+            records["matrix"],
+            records["omega"],
+            records["goniometer"][:, 2],
+        )
+    O = get_orthogonalization_matrix(*records["crystal"][0])
+    return Astars, inpfiles, O
@@ -0,0 +1,108 @@
+"""
+Field-symmetry alignment (FSA) of every parent symop with many vectors.
+
+The FSA of a symop rotation R and a vector v in crystal fractional
+coordinates is -cos of the physical angle between v and Rv, and R is
+broken for v if Rv is not v in the metric norm. The rotations of all
+symops are stacked into an (S, 3, 3) array, and FSA, angle, and broken
+flags against V vectors (F facet normals, or the field vector of each of
+N frames) are computed as (S, V) arrays in one batch.
+"""
+
+import numpy as np
+
+
+def symop_rotations(parent_sg, den=None):
+    """
+    Symops of `parent_sg` in gemmi order and their rotations.
+
+    Returns
+    -------
+    ops : list of gemmi.Op
+    R : np.ndarray, shape (S, 3, 3)
+        Rotation of each op divided by `den` (default: the op's DEN), as
+        `gemmi_to_rot` does.
+    """
+    import gemmi
+
+    ops = list(gemmi.SpaceGroup(str(parent_sg)).operations().sym_ops)
+    R = np.array([op.rot for op in ops], dtype=float).reshape(-1, 3, 3)
+    dens = np.array([op.DEN if den is None else den for op in ops], dtype=float)
+    return ops, R / dens[:, None, None]
+
+
+def fsa_matrix(R, V, G, atol=1e-5):
+    """
+    FSA, angle, and broken flag of every rotation in `R` with every vector
+    in `V`.
+
+    Parameters
+    ----------
+    R : np.ndarray, shape (S, 3, 3)
+        Symop rotations in fractional coordinates
+    V : np.ndarray, shape (n, 3)
+        Vectors in crystal fractional coordinates
+    G : np.ndarray, shape (3, 3)
+        Metric tensor, O^T O
+    atol : float
+        Tolerance of the broken test, relative to the larger metric norm
+        of v and Rv (at least 1), as in `metric_close`
+
+    Returns
+    -------
+    fsa, angle_deg, broken : np.ndarray, shape (S, n)
+    """
+    R = np.asarray(R, dtype=float)
+    V = np.asarray(V, dtype=float).reshape(-1, 3)
+    RV = np.einsum("sij,nj->sni", R, V)
+
+    nv = np.sqrt(np.einsum("ni,ij,nj->n", V, G, V))
+    nrv = np.sqrt(np.einsum("sni,ij,snj->sn", RV, G, RV))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosang = np.clip(np.einsum("ni,ij,snj->sn", V, G, RV) / (nv * nrv), -1.0, 1.0)
+
+    diff = RV - V
+    diff_norm = np.sqrt(np.einsum("sni,ij,snj->sn", diff, G, diff))
+    scale = np.maximum(np.maximum(nv, nrv), 1.0)
+
+    return -cosang, np.degrees(np.arccos(cosang)), diff_norm > atol * scale
+
+
+def compute_fsa(parent_sg, vectors, O, den=None, atol=1e-5):
+    """
+    FSA table of all symops of `parent_sg` against `vectors`.
+
+    Returns
+    -------
+    dict of np.ndarray
+        opnum, symop : (S,)
+        fsa, angle_deg, broken : (S, n)
+    """
+    ops, R = symop_rotations(parent_sg, den=den)
+    fsa, angle_deg, broken = fsa_matrix(R, vectors, O.T @ O, atol=atol)
+    return {
+        "opnum": np.arange(len(ops)),
+        "symop": np.array([op.triplet() for op in ops], dtype=str),
+        "fsa": fsa,
+        "angle_deg": angle_deg,
+        "broken": broken,
+    }
+
+
+def write_fsa(tables, path):
+    """
+    Write FSA tables to an .npz file.
+
+    `tables` maps a prefix to a `compute_fsa` result plus any arrays
+    describing its vectors; each array is stored as <prefix>_<name>, e.g.
+    facets_fsa, facets_hkl, frames_broken, frames_images.
+    """
+    if not str(path).endswith(".npz"):
+        raise ValueError(f"Unsupported FSA output format {path!r}; use .npz")
+    arrays = {}
+    for prefix, table in tables.items():
+        for name, value in table.items():
+            arrays[f"{prefix}_{name}"] = np.asarray(value)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+    return
@@ -1,4 +1,3 @@
-import gemmi
 import numpy as np
 
 ##COORDINATE TRANSFORMATIONS
@@ -38,6 +37,115 @@ def facet_normal_to_crystal_frame(hkl, O):
     return v / np.linalg.norm(v)
 
 
+## BATCHED COORDINATE TRANSFORMATIONS
+## Stacked counterparts of the functions above, for many facets and frames.
+
+
+def get_normal_vectors(hkls, Astars):
+    """
+    Get lab-frame normal vectors for F Miller planes on N frames.
+
+    Parameters
+    ----------
+    hkls : array_like, shape (F, 3)
+        Miller indices of the facets.
+    Astars : array_like, shape (N, 3, 3)
+        Stacked A* matrices.
+
+    Returns
+    -------
+    np.ndarray, shape (N, F, 3)
+        Equivalent to ``hkl @ Astar.T`` for every (frame, facet) pair.
+    """
+    hkls = np.asarray(hkls, dtype=float)
+    Astars = np.asarray(Astars, dtype=float)
+    return np.einsum("fj,nij->nfi", hkls, Astars)
+
+
+def lab_vec_to_crystal_batch(v_lab, Astars):
+    """
+    Convert a lab-frame vector into crystal fractional coordinates on N frames.
+
+    Returns an (N, 3) array of unit vectors, one row per A* matrix.
+    """
+    v_lab = np.array(v_lab, dtype=float)
+    v_cryst = np.einsum("j,njk->nk", v_lab, np.asarray(Astars, dtype=float))
+    return v_cryst / np.linalg.norm(v_cryst, axis=-1, keepdims=True)
+
+
+def facet_normals_to_crystal_frame(hkls, O):
+    """
+    Convert an (F, 3) array of facet normals hkl into direct-space
+    (fractional coordinates) unit vectors, inverting the metric tensor once.
+    """
+    hkls = np.asarray(hkls, dtype=float)
+    v = hkls @ np.linalg.inv(O.T @ O)
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+## FACET GENERATION
+
+
+def d_spacings(hkls, O):
+    """
+    Interplanar spacings of an (F, 3) array of Miller planes, from the
+    reciprocal metric tensor inv(O.T @ O).
+    """
+    hkls = np.asarray(hkls, dtype=float)
+    Gstar = np.linalg.inv(O.T @ O)
+    return 1.0 / np.sqrt(np.einsum("fi,ij,fj->f", hkls, Gstar, hkls))
+
+
+def generate_facets(hmax=None, O=None, dmin=None, dmax=None):
+    """
+    Generate all primitive (gcd = 1) Miller planes as one integer array.
+
+    Parameters
+    ----------
+    hmax : int, optional
+        Maximal absolute Miller index.
+    O : np.ndarray, shape (3, 3), optional
+        Orthogonalization matrix; required for `dmin` and `dmax`.
+    dmin, dmax : float, optional
+        Keep only planes with dmin <= d <= dmax. With `dmin`, the index
+        range along each axis is bounded by |a_i| / dmin, so `hmax` may be
+        omitted or set large for anisotropic cells.
+
+    Returns
+    -------
+    np.ndarray, shape (F, 3)
+        Facets in the order of itertools.product over (-h, ..., h).
+    """
+    if (dmin is not None or dmax is not None) and O is None:
+        raise ValueError("O is required to prune facets by d-spacing")
+    if hmax is None and dmin is None:
+        raise ValueError("Please provide hmax, dmin, or both")
+
+    bounds = np.full(3, np.iinfo(np.int64).max if hmax is None else int(hmax))
+    if dmin is not None:
+        cell_lengths = np.linalg.norm(O, axis=0)
+        # |h| <= |a| / d exactly; the tolerance keeps planes with d == dmin
+        # whose bound rounds just below an integer
+        bounds = np.minimum(bounds, np.floor(cell_lengths / dmin * (1 + 1e-9)).astype(np.int64))
+
+    h, k, l = (np.arange(-n, n + 1) for n in bounds)
+    hkls = np.stack(np.meshgrid(h, k, l, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    # the gcd of (0, 0, 0) is 0, so this also drops the origin
+    hkls = hkls[np.gcd.reduce(hkls, axis=1) == 1]
+
+    if dmin is not None or dmax is not None:
+        d = d_spacings(hkls, O)
+        keep = np.ones(len(hkls), dtype=bool)
+        if dmin is not None:
+            keep &= d >= dmin
+        if dmax is not None:
+            keep &= d <= dmax
+        hkls = hkls[keep]
+
+    return hkls
+
+
 ## HELPERS 
 
 def fmt_vec(v, ndigits=4):
@@ -54,6 +162,17 @@ def angle(v1, v2):
 
 
 
+def angle_batch(v1s, v2):
+    """
+    Compute angles between a stack of vectors (..., 3) and a single vector
+    in Euclidean space. Returns radians with shape (...).
+    """
+    v1s = np.asarray(v1s, dtype=float)
+    v2 = np.asarray(v2, dtype=float)
+    cosang = (v1s @ v2) / (np.linalg.norm(v1s, axis=-1) * np.linalg.norm(v2))
+    return np.arccos(cosang)
+
+
 def dot_metric(u, v, G):
     """
     Physical dot product between fractional-coordinate vectors u and v.
@@ -100,6 +219,19 @@ def angle_metric(u, v, G):
     """
     return float(np.degrees(np.arccos(cosine_metric(u, v, G))))
 
+def angle_metric_matrix(U, V, G):
+    """
+    Physical angles in degrees between every row of U (N, 3) and every row
+    of V (F, 3), both in fractional coordinates. Returns an (N, F) array.
+    """
+    U = np.asarray(U, dtype=float)
+    V = np.asarray(V, dtype=float)
+    dots = U @ G @ V.T
+    nu = np.sqrt(np.einsum("ni,ij,nj->n", U, G, U))
+    nv = np.sqrt(np.einsum("fi,ij,fj->f", V, G, V))
+    cosang = np.clip(dots / np.outer(nu, nv), -1.0, 1.0)
+    return np.degrees(np.arccos(cosang))
+
 def gemmi_to_rot(op, den=None):
     """
     Convert Gemmi symop rotation to a 3x3 float matrix.
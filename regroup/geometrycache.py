@@ -0,0 +1,194 @@
+"""
+On-disk cache of parsed frame geometry.
+
+Each entry stores the A* stack, O, and image names read from a set of
+.inp or .expt files as an uncompressed .npz file. Entries are keyed by the
+file paths plus their size and modification time (or, optionally, a hash
+of their contents), and the cache directory is kept under a size limit by
+evicting the least recently used entries.
+
+The cache is best-effort: if the directory cannot be read or written, a
+warning is issued and the geometry is used uncached.
+"""
+
+import hashlib
+import os
+import warnings
+import numpy as np
+
+# Bump when the cached arrays or the readers that produce them change
+GEOMETRY_CACHE_VERSION = 1
+
+
+def default_cache_dir():
+    """
+    Get the geometry cache directory: $REGROUP_CACHE_DIR, or regroup/
+    under $XDG_CACHE_HOME (default ~/.cache).
+    """
+    path = os.environ.get("REGROUP_CACHE_DIR")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "regroup")
+
+
+class GeometryCache():
+    """
+    Size-bounded LRU cache of parsed frame geometry.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        Directory holding the cache entries. Default: `default_cache_dir()`
+    max_bytes : int
+        Total size of the entries above which the least recently used are
+        evicted.
+    content_hash : bool
+        Key entries by a SHA-256 of the file contents instead of their size
+        and modification time.
+    """
+
+    #-------------------------------------------------------------------#
+    # Constructor
+
+    def __init__(self, cache_dir=None, max_bytes=256 * 2**20, content_hash=False):
+        self._cache_dir = cache_dir or default_cache_dir()
+        self._max_bytes = int(max_bytes)
+        self._content_hash = content_hash
+
+    #-------------------------------------------------------------------#
+    # Attributes
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    #-------------------------------------------------------------------#
+    # Cache Methods
+
+    def key(self, paths):
+        """
+        Cache key of a list of geometry files.
+        """
+        h = hashlib.sha256(f"regroup-geometry-v{GEOMETRY_CACHE_VERSION}\n".encode())
+        for path in paths:
+            path = os.path.abspath(path)
+            h.update(path.encode())
+            if self._content_hash:
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        h.update(block)
+            else:
+                st = os.stat(path)
+                h.update(f"\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, paths):
+        """
+        Look up the geometry of `paths`.
+
+        Returns
+        -------
+        (Astars, images, O) or None
+            None if there is no entry for the current state of the files.
+        """
+        try:
+            entry = self._entry(self.key(paths))
+        except OSError:
+            return None
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                Astars = data["Astars"]
+                images = data["images"].tolist()
+                O = data["O"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return Astars, images, O
+
+    def put(self, paths, Astars, images, O):
+        """
+        Store the geometry of `paths` and evict old entries if the cache
+        is over its size limit. If the cache cannot be written, warn and
+        leave it unchanged.
+        """
+        tmp = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = self._entry(self.key(paths))
+            tmp = f"{entry}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    Astars=np.asarray(Astars, dtype=float),
+                    images=np.asarray(images, dtype=str),
+                    O=np.asarray(O, dtype=float),
+                )
+            os.replace(tmp, entry)
+        except OSError as e:
+            warnings.warn(f"Could not write the geometry cache in {self.cache_dir}, continuing uncached: {e}")
+            if tmp is not None and os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            return
+        self.evict(keep=entry)
+        return
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used entries until the cache fits in
+        `max_bytes`. The entry `keep` is never deleted.
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError as e:
+            warnings.warn(f"Could not list the geometry cache in {self.cache_dir}: {e}")
+            return
+        entries = []
+        for name in names:
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        return
+
+    def clear(self):
+        """
+        Delete all cache entries.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.cache_dir, name))
+        return
@@ -14,9 +14,12 @@ regroup.low_sym e020_{off,200ns}.mtz --op 'a-b,b-c,a+b+c' --ls_sg P1
 
 
 import argparse
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import reciprocalspaceship as rs
 import gemmi
 import numpy as np
 
@@ -75,74 +78,562 @@ def cctbx_cb_op_to_rs_op(s):
     raise ValueError(f"Could not determine cctbx notation in {s!r}")
 
 
-def _valid_cell_volume(mtz, op, _ratio, verbose=True):
-    #cell1 = mtz.cell.changed_basis_forward(op,True) # with the right transformation, 
-    cell1 = mtz.cell.changed_basis_forward(op.inverse(), True)
-    old_new_smaller = mtz.cell.volume / cell1.volume
+def _valid_cell_volume(cell, op, _ratio, verbose=True):
+    #cell1 = cell.changed_basis_forward(op,True) # with the right transformation, 
+    cell1 = cell.changed_basis_forward(op.inverse(), True)
+    old_new_smaller = cell.volume / cell1.volume
     if verbose:
         print("\n")
-        print("old cell:", mtz.cell)
+        print("old cell:", cell)
         print("new cell:" , cell1)
-        print(f"The new cell has a volume {mtz.cell.volume/cell1.volume:0.2f} times smaller than the old cell.")
+        print(f"The new cell has a volume {cell.volume/cell1.volume:0.2f} times smaller than the old cell.")
         
     return np.isclose(old_new_smaller, _ratio)
 
-def _add_Hhs(mtz_in):
-    mtz = mtz_in.copy()
-    mtz["Hh"], mtz["Kh"], mtz["Lh"] = mtz.get_hkls().T
-    mtz.Hh = mtz.Hh.astype("MTZInt")
-    mtz.Kh = mtz.Kh.astype("MTZInt")
-    mtz.Lh = mtz.Lh.astype("MTZInt")
+def _get_hkls_inplace(mtz):
+    """
+    HKLs of an HKL-indexed `mtz` as a new (N, 3) int32 array, read from
+    the index codes. `DataSet.get_hkls` copies the whole dataset.
+    """
+    if list(mtz.index.names) != ["H", "K", "L"]:
+        mtz.set_index(["H", "K", "L"], inplace=True)
+    H = np.empty((len(mtz), 3), dtype=np.int32)
+    for i, (level, codes) in enumerate(zip(mtz.index.levels, mtz.index.codes)):
+        H[:, i] = level.to_numpy()[codes]
+    return H
+
+def _hkl_index(H, names=("H", "K", "L")):
+    """
+    MultiIndex of HKLs built from offsets into contiguous integer levels,
+    which avoids hashing every reflection as `MultiIndex.from_arrays` does.
+    """
+    import pandas as pd
+
+    levels = []
+    codes = []
+    for i in range(3):
+        v = H[:, i]
+        lo = int(v.min()) if len(v) else 0
+        hi = int(v.max()) if len(v) else -1
+        levels.append(pd.Index(pd.array(np.arange(lo, hi + 1, dtype=np.int32), dtype="HKL")))
+        codes.append(v - lo)
+    return pd.MultiIndex(levels=levels, codes=codes, names=list(names), verify_integrity=False)
+
+def _add_Hhs_inplace(mtz):
+    """
+    Add Hh, Kh, Lh to `mtz` without copying it, and return its HKLs as a
+    new (N, 3) int32 array.
+    """
+    import pandas as pd
+
+    H = _get_hkls_inplace(mtz)
+    mtz["Hh"] = pd.array(H[:, 0], dtype="MTZInt")
+    mtz["Kh"] = pd.array(H[:, 1], dtype="MTZInt")
+    mtz["Lh"] = pd.array(H[:, 2], dtype="MTZInt")
+    return H
+
+def _reindex_hkls(H, rot, den, chunk_size=1_000_000):
+    """
+    Reindex the integer HKLs `H`, (N, 3), by the integer rotation `rot` of
+    a gemmi.Op with denominator `den`: H @ rot / den, exactly.
+
+    Divisibility by `den` is checked for every reflection, `chunk_size`
+    at a time. If any HKL becomes fractional, the error gives how many
+    and a few examples.
+
+    Returns
+    -------
+    np.ndarray
+        New HKLs as an (N, 3) int32 array
+    """
+    out = np.empty(H.shape, dtype=np.int32)
+    n_frac = 0
+    examples = []
+    for start in range(0, len(H), chunk_size):
+        chunk = H[start:start + chunk_size]
+        hkl = chunk @ rot
+        frac = (hkl % den).any(axis=1)
+        if frac.any():
+            n_frac += int(frac.sum())
+            for h, k in zip(chunk[frac][:5 - len(examples)], hkl[frac][:5 - len(examples)]):
+                new = ", ".join(f"{x / den:g}" for x in k)
+                examples.append(f"({h[0]}, {h[1]}, {h[2]}) -> ({new})")
+            continue
+        out[start:start + chunk_size] = hkl // den
+
+    if n_frac:
+        raise RuntimeError(
+            f"Fractional Miller indices when reindexing HKLs, suggesting incorrect change-of-basis operation. "
+            f"{n_frac} of {len(H)} HKLs become fractional, e.g. {'; '.join(examples)}"
+        )
+    return out
+
+def _consistent_cells(rot, den, cell_old, cell_new, rtol=1e-5):
+    """
+    Whether HKLs reindexed by `rot`/`den` have the same d-spacings in
+    `cell_new` as before in `cell_old`, for all HKLs.
+
+    With the orthogonalization matrices O, 1/d^2 = h G* h^T, where the
+    reciprocal metric is G* = (O^T O)^-1. Reindexing h' = h M with
+    M = rot / den keeps every d if M G*_new M^T = G*_old.
+    """
+    def reciprocal_metric(cell):
+        O = np.array(cell.orth.mat.tolist())
+        return np.linalg.inv(O.T @ O)
+
+    M = np.asarray(rot, dtype=float) / den
+    G_old = reciprocal_metric(cell_old)
+    G_new = M @ reciprocal_metric(cell_new) @ M.T
+    return np.abs(G_new - G_old).max() <= rtol * np.abs(G_old).max()
+
+def _reindex_inplace(mtz, H, op, chunk_size=1_000_000, rot=None):
+    """
+    Reindex `mtz` with `op` in place, as `apply_symop` does.
+
+    `H` holds the HKLs of `mtz` (from `_add_Hhs_inplace`); the reindexed
+    HKLs replace the index. Phases and complex structure factors are
+    shifted in place. `rot` is the int64 rotation of `op`, if already
+    computed. The cells are checked once by `ReindexPlan.new_cell`, not
+    per reflection.
+    """
+    from reciprocalspaceship.utils import canonicalize_phases, phase_shift
+
+    if rot is None:
+        rot = np.array(op.rot, dtype=np.int64)
+    phase_keys = mtz.get_phase_keys()
+    complex_keys = mtz.get_complex_keys()
+
+    H_new = _reindex_hkls(H, rot, op.DEN, chunk_size=chunk_size)
+
+    if phase_keys or complex_keys:
+        shifts = np.empty(len(H))
+        for start in range(0, len(H), chunk_size):
+            shifts[start:start + chunk_size] = phase_shift(H[start:start + chunk_size], op)
+
+    # phase handling as in rs.DataSet.apply_symop
+    phic = -1 if op.det_rot() < 0 else 1
+    for key in phase_keys:
+        mtz[key] = canonicalize_phases(phic * (mtz[key] - np.rad2deg(shifts)), deg=True)
+    for key in complex_keys:
+        mtz[key] *= np.exp(-1j * shifts)
+        if op.det_rot() < 0:
+            mtz[key] = np.conjugate(mtz[key])
+
+    mtz.index = _hkl_index(H_new, mtz.index.names)
     return mtz
 
-def mtz_regroup_basis_change(mtz_path, op_from_regroup, lowsym, verbose=True):
+class ReindexPlan():
+    """
+    Change of basis from a regroup op to the space group `lowsym`, compiled
+    once and applied to any number of datasets in the parent space group.
 
-    # we save copies of the high-symmetry HKLs. 
-    mtz = rs.read_mtz(mtz_path)
-    mtz = _add_Hhs(mtz)
-    if lowsym is None: 
+    The op conversion, the expected volume ratio, and the cell-volume check
+    are done by the constructor; the volume ratio of a basis change does
+    not depend on the cell, so the check holds for every dataset the plan
+    matches. New cells are computed once per distinct input cell. Plans
+    can be pickled and sent to worker processes.
+
+    Parameters
+    ----------
+    op_from_regroup : str
+        Change-of-basis op from regroup, e.g. 'a-b,b-c,a+b+c'
+    lowsym : str or gemmi.SpaceGroup or None
+        Low-symmetry space group. If None, `apply` only adds Hh, Kh, Lh.
+    cell : gemmi.UnitCell
+        Cell of the datasets, used for the volume check
+    spacegroup : gemmi.SpaceGroup
+        Parent space group of the datasets
+    verbose : bool
+        Print the cell-volume check and the op for careless
+    """
+
+    #-------------------------------------------------------------------#
+    # Constructor
+
+    def __init__(self, op_from_regroup, lowsym, cell, spacegroup, verbose=True):
+        if isinstance(lowsym, str):
+            lowsym = gemmi.SpaceGroup(lowsym)
+        self._op_from_regroup = op_from_regroup
+        self._lowsym = lowsym
+        self._spacegroup = spacegroup
+        self._new_cells = {}
+        if lowsym is None:
+            self._op = None
+            self._rot = None
+            return
+
+        op1 = cctbx_cb_op_to_rs_op(op_from_regroup)
+
+        #we check that unit cell scaling is correct. 
+        nl_cenops = len(lowsym.operations().cen_ops)
+        nh_cenops = len(spacegroup.operations().cen_ops)
+        _ratio = nh_cenops / nl_cenops
+
+        if not _valid_cell_volume(cell, op1, _ratio, verbose=verbose):
+            raise RuntimeError(
+                f"Unit cell does not scale by the expected amount {_ratio}, (see documentation). please check your operation."
+            )
+        if verbose:
+            print(f"op for careless: ", op1.inverse().triplet())
+
+        self._op = op1
+        self._rot = np.array(op1.rot, dtype=np.int64)
+
+    @classmethod
+    def from_mtz(cls, mtz, op_from_regroup, lowsym, verbose=True):
+        """
+        Plan for the cell and space group of `mtz`, a DataSet, gemmi.Mtz,
+        or path. Only the header of a file is read.
+        """
+        if isinstance(mtz, (str, Path)):
+            mtz = gemmi.read_mtz_file(str(mtz), with_data=False)
+        return cls(op_from_regroup, lowsym, mtz.cell, mtz.spacegroup, verbose=verbose)
+
+    #-------------------------------------------------------------------#
+    # Attributes
+
+    @property
+    def op(self):
+        """
+        gemmi.Op applied to the HKLs, or None without `lowsym`
+        """
+        return self._op
+
+    @property
+    def rot(self):
+        """
+        Integer rotation of `op` (in units of `op.DEN`), as int64
+        """
+        return self._rot
+
+    @property
+    def lowsym(self):
+        return self._lowsym
+
+    @property
+    def spacegroup(self):
+        return self._spacegroup
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # gemmi.Op cannot be pickled
+        state["_op"] = None if self._op is None else self._op.triplet()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._op is not None:
+            self._op = gemmi.Op(self._op)
+
+    #-------------------------------------------------------------------#
+    # Methods
+
+    def matches(self, spacegroup):
+        """
+        Whether the plan applies to datasets in `spacegroup`.
+        """
+        if self.lowsym is None:
+            return True
+        return spacegroup is not None and spacegroup.hm == self.spacegroup.hm
+
+    def _check(self, mtz):
+        if not self.matches(mtz.spacegroup):
+            raise ValueError(
+                f"Reindexing plan for {self.spacegroup.hm} cannot be applied to a dataset in {mtz.spacegroup.hm}."
+            )
+
+    def new_cell(self, cell):
+        """
+        `cell` in the new basis, checked once to give the same d-spacing
+        for every reindexed HKL.
+        """
+        if self.op is None:
+            return cell
+        key = tuple(cell.parameters)
+        if key not in self._new_cells:
+            cell_new = cell.changed_basis_forward(self.op.inverse(), True)
+            if not _consistent_cells(self.rot, self.op.DEN, cell, cell_new):
+                raise RuntimeError(
+                    f"old unit cell and new unit cell do not provide consistent dHKLs."
+                )
+            self._new_cells[key] = cell_new
+        return self._new_cells[key]
+
+    def apply(self, mtz, chunk_size=1_000_000):
+        """
+        Add Hh, Kh, Lh to the DataSet `mtz` and reindex it in place.
+        """
+        self._check(mtz)
+        if self.lowsym is None:
+            _add_Hhs_inplace(mtz)
+            return mtz
+        cell_new = self.new_cell(mtz.cell)
+        H = _add_Hhs_inplace(mtz)
+        mtz = _reindex_inplace(mtz, H, self.op, chunk_size=chunk_size, rot=self.rot)
+        mtz.cell = cell_new
+        mtz.spacegroup = self.lowsym
         return mtz
-    op1 = cctbx_cb_op_to_rs_op(op_from_regroup)
-    
-    #we check that unit cell scaling is correct. 
-    if isinstance(lowsym, str):
-        lowsym = gemmi.SpaceGroup(lowsym)
 
-    nl_cenops = len(lowsym.operations().cen_ops)
+def mtz_regroup_basis_change(mtz_path, op_from_regroup, lowsym, verbose=True, inplace=False, chunk_size=1_000_000, plan=None):
+    """
+    Save the HKLs of an MTZ as Hh, Kh, Lh and change it to the space group
+    `lowsym` with the regroup basis-change op.
 
-    nh_cenops = len(mtz.spacegroup.operations().cen_ops)
-    _ratio = nh_cenops / nl_cenops
+    The HKLs are reindexed exactly in an integer array, `chunk_size`
+    reflections at a time, and Hh/Kh/Lh are the only new columns; the
+    old and new cells are checked once for consistent dHKLs. A DataSet
+    passed as `mtz_path` is copied first, or changed in place with `inplace`.
 
-    if ~_valid_cell_volume(mtz, op1, _ratio):
-        raise RuntimeError(
-            f"Unit cell does not scale by the expected amount {_ratio}, (see documentation). please check your operation."
-        )
+    A `ReindexPlan` compiled for many datasets may be passed as `plan`, in
+    which case `op_from_regroup` and `lowsym` are taken from the plan.
+    """
 
-    mtz = mtz.compute_dHKL()
-    mtz["dHKL_old"] = mtz["dHKL"]
+    import reciprocalspaceship as rs
 
-    #change spacegroup and unit cell 
-    mtz.cell = mtz.cell.changed_basis_forward(op1.inverse(), True)
-    mtz.spacegroup = lowsym
-        
-    #apply symop 
-    if verbose: 
-        print(f"op for careless: ", op1.inverse().triplet())
-        #print(f"final operation: {op1}")
+    if isinstance(mtz_path, rs.DataSet):
+        mtz = mtz_path if inplace else mtz_path.copy()
+    else:
+        mtz = rs.read_mtz(mtz_path)
+    if plan is None:
+        plan = ReindexPlan(op_from_regroup, lowsym, mtz.cell, mtz.spacegroup, verbose=verbose)
+
+    # we save copies of the high-symmetry HKLs. 
+    return plan.apply(mtz, chunk_size=chunk_size)
+
+
+#-----------------------------------------------------------------------#
+# Streaming reindexing
+#
+# An MTZ file is an 80-byte preamble, the reflection data as float32 rows
+# (one value per column), and the text header. Blocks of rows are read
+# through a memory map, converted like an in-memory dataset, and appended
+# to the output; the header is written last, from the first converted
+# block with the row count, column ranges, and resolution range of all
+# blocks.
+
+_MTZ_DATA_OFFSET = 80
+
+def _mtz_data(mtz_path, header):
+    """
+    Memory map of the reflection data of an MTZ file, (nreflections, ncol).
+    """
+    with open(mtz_path, "rb") as f:
+        stamp = f.read(12)[8]
+    # machine stamp: 1 for big-endian, 4 for little-endian IEEE floats
+    dtype = ">f4" if stamp >> 4 == 1 else "<f4"
+    return np.memmap(
+        mtz_path, dtype=dtype, mode="r", offset=_MTZ_DATA_OFFSET,
+        shape=(header.nreflections, len(header.columns)),
+    )
+
+def _has_duplicate_hkls(data, header, chunk_size):
+    """
+    Whether any Miller index occurs more than once in the memory-mapped
+    reflection `data`, read `chunk_size` rows at a time.
+
+    Each block is checked on its own first, which finds the repeats of
+    unmerged data in the first block. Only if no block repeats an index
+    are the sorted keys of all blocks compared, which holds 8 bytes per
+    reflection.
+    """
+    labels = header.column_labels()
+    cols = [labels.index(label) for label in ("H", "K", "L")]
+    keys = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        hkl = np.rint(data[start:start + chunk_size, cols]).astype(np.int64)
+        # |index| < 2**20, as MTZ files store them in float32
+        hkl += 1 << 20
+        block = keys[start:start + len(hkl)]
+        block[:] = (hkl[:, 0] << 42) | (hkl[:, 1] << 21) | hkl[:, 2]
+        block.sort()
+        if (block[1:] == block[:-1]).any():
+            return True
+    if len(keys) <= chunk_size:
+        return False
+    keys.sort()
+    return bool((keys[1:] == keys[:-1]).any())
+
+def _mtz_header_bytes(template, nreflections, col_min, col_max, min_1_d2, max_1_d2):
+    """
+    Preamble and text header of an MTZ with the columns and metadata of
+    `template` and the given row count and ranges.
+    """
+    ncol = len(template.columns)
+    template.set_data(np.vstack([col_min, col_max]).astype(np.float32))
+    raw = template.write_to_bytes()
+    offset = (struct.unpack("=i", raw[4:8])[0] - 1) * 4
+
+    records = []
+    for i in range(offset, len(raw), 80):
+        record = raw[i:i + 80]
+        if record.startswith(b"NCOL"):
+            _, n, _, nbatch = record.split()[:4]
+            record = f"NCOL {int(n):8d} {nreflections:12d} {int(nbatch):8d}".ljust(80).encode()
+        elif record.startswith(b"RESO"):
+            record = f"RESO {min_1_d2:<20.12f} {max_1_d2:<20.12f}".ljust(80).encode()
+        records.append(record)
+
+    preamble = bytearray(raw[:_MTZ_DATA_OFFSET])
+    word = _MTZ_DATA_OFFSET // 4 + nreflections * ncol + 1
+    if word < 2**31:
+        preamble[4:8] = struct.pack("=i", word)
+    else:
+        preamble[4:8] = struct.pack("=i", -1)
+        preamble[12:20] = struct.pack("=q", word)
+    return bytes(preamble), b"".join(records)
+
+def stream_regroup_basis_change(mtz_path, out, op_from_regroup, lowsym, chunk_size=1_000_000, verbose=True, plan=None):
+    """
+    `mtz_regroup_basis_change` and `write_mtz` for MTZ files larger than
+    memory.
+
+    Reflections are read, converted in place, validated, and written
+    `chunk_size` rows at a time, so peak memory is bounded by the chunk
+    size. The output matches converting the whole file in memory. As in
+    `rs.read_mtz`, a file is unmerged if it has an M/ISYM column and a
+    repeated Miller index anywhere in the file. For unmerged data this is
+    found in the first block; a file with an M/ISYM column and no repeat
+    within any block takes one extra pass over its Miller indices, with 8
+    bytes per reflection (see `_has_duplicate_hkls`). The op is compiled once into a
+    `ReindexPlan` (or `plan` is used) for all blocks.
+
+    Returns
+    -------
+    str
+        The output filename
+    """
+    from reciprocalspaceship.io.mtz import from_gemmi
+
+    header = gemmi.read_mtz_file(str(mtz_path), with_data=False)
+    data = _mtz_data(mtz_path, header)
+    m_isym = [c.label for c in header.columns if c.type == "Y"]
+    unmerged = bool(m_isym) and _has_duplicate_hkls(data, header, chunk_size)
+    if unmerged and len(m_isym) > 1:
+        raise ValueError("Only a single M/ISYM column is supported for unmerged data")
+    if plan is None or not plan.matches(header.spacegroup):
+        plan = ReindexPlan(op_from_regroup, lowsym, header.cell, header.spacegroup, verbose=verbose)
+
+    template = None
+    col_min = col_max = None
+    min_1_d2, max_1_d2 = np.inf, -np.inf
+    n_out = 0
+    tmp = f"{out}.{os.getpid()}.tmp"
     try:
-        mtz = mtz.apply_symop(op1)
-    except:
-        raise RuntimeError(
-            f"Fractional Miller indices when reindexing HKLs, suggesting incorrect change-of-basis operation."
-        )
-    mtz = mtz.compute_dHKL()
+        with open(tmp, "wb") as f:
+            f.write(bytes(_MTZ_DATA_OFFSET))
+            for start in range(0, max(len(data), 1), chunk_size):
+                header.set_data(np.array(data[start:start + chunk_size], dtype=np.float32).reshape(-1, len(header.columns)))
+                ds = from_gemmi(header)
+                if unmerged and ds.merged:
+                    # a block without repeated HKLs still holds unmerged data
+                    ds.merged = False
+                    ds.hkl_to_observed(m_isym[0], inplace=True)
+                ds = plan.apply(ds, chunk_size=chunk_size)
+                if not ds.merged:
+                    # as write_mtz does for a file with reflections outside
+                    # the ASU; to_gemmi would skip this for some blocks
+                    ds.hkl_to_asu(inplace=True)
+                block = ds.to_gemmi()
+                rows = np.asarray(block.array, dtype=np.float32)
+                del ds
+
+                if template is None:
+                    template = block
+                    col_min = np.full(rows.shape[1], np.nan, dtype=np.float32)
+                    col_max = np.full(rows.shape[1], np.nan, dtype=np.float32)
+                if len(rows):
+                    col_min = np.fmin(col_min, np.fmin.reduce(rows, axis=0))
+                    col_max = np.fmax(col_max, np.fmax.reduce(rows, axis=0))
+                    # in double precision, as gemmi does for the header
+                    s_vec = rows[:, :3].astype(float) @ np.array(block.cell.frac.mat.tolist())
+                    d2 = (s_vec * s_vec).sum(axis=1)
+                    min_1_d2 = min(min_1_d2, float(d2.min()))
+                    max_1_d2 = max(max_1_d2, float(d2.max()))
+                f.write(rows.tobytes())
+                n_out += len(rows)
+
+            if n_out == 0:
+                min_1_d2 = max_1_d2 = 0.0
+            preamble, text = _mtz_header_bytes(template, n_out, col_min, col_max, min_1_d2, max_1_d2)
+            f.write(text)
+            f.seek(0)
+            f.write(preamble)
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return out
+
+def _output_path(hs_mtz, sg_num):
+    p = Path(hs_mtz)
+    return str(p.with_name(f"{p.stem}_sg{sg_num}{p.suffix}"))
+
+def convert_mtz(hs_mtz, op, ls_sg, out=None, verbose=True, stream=False, chunk_size=1_000_000, plan=None):
+    """
+    Read `hs_mtz` once, convert it in place with
+    `mtz_regroup_basis_change`, and write it to `out` (default: <input>_sg<number>.mtz, with the number of
+    `ls_sg`, or of the input space group if `ls_sg` is None). With
+    `stream`, the file is converted in blocks of `chunk_size` reflections
+    by `stream_regroup_basis_change`.
 
-    if not np.allclose(mtz["dHKL"], mtz["dHKL_old"], atol=1e-3):
-        raise RuntimeError(
-            f"old unit cell and new unit cell do not provide consistent dHKLs."
-        )
-    return mtz.drop(columns=["dHKL", "dHKL_old"])
+    `plan` is a `ReindexPlan` shared by many files; it is used if it
+    matches the space group of `hs_mtz`, and a plan for this file is
+    compiled otherwise.
 
+    Returns
+    -------
+    str
+        The output filename
+    """
+    import reciprocalspaceship as rs
+
+    if stream:
+        if out is None:
+            if ls_sg is None:
+                sg_num = gemmi.read_mtz_file(str(hs_mtz), with_data=False).spacegroup.number
+            else:
+                sg_num = gemmi.SpaceGroup(ls_sg).number
+            out = _output_path(hs_mtz, sg_num)
+        return stream_regroup_basis_change(hs_mtz, out, op, ls_sg, chunk_size=chunk_size, verbose=verbose, plan=plan)
+
+    mtz = rs.read_mtz(hs_mtz)
+    if ls_sg is None:
+        sg_num = mtz.spacegroup.number
+    else:
+        sg_num = gemmi.SpaceGroup(ls_sg).number
+    if out is None:
+        out = _output_path(hs_mtz, sg_num)
+
+    if plan is not None and not plan.matches(mtz.spacegroup):
+        plan = None
+    mtz = mtz_regroup_basis_change(mtz, op, ls_sg, verbose=verbose, inplace=True, chunk_size=chunk_size, plan=plan)
+    mtz.write_mtz(out)
+    return out
+
+def _convert_mtz_task(hs_mtz, op, ls_sg, out, verbose, stream=False, chunk_size=1_000_000, plan=None):
+    """
+    `convert_mtz` for a worker process: errors are returned, not raised,
+    so that one bad file does not abort the batch.
+    """
+    try:
+        out = convert_mtz(hs_mtz, op, ls_sg, out=out, verbose=verbose, stream=stream, chunk_size=chunk_size, plan=plan)
+        return out, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _report(hs_mtzs, results):
+    """
+    Print the outcome of each conversion, in input order, and return the
+    inputs that failed.
+    """
+    failed = []
+    for hs_mtz, (out, error) in zip(hs_mtzs, results):
+        if error is None:
+            print(f"Wrote {out}")
+        else:
+            print(f"Failed {hs_mtz}: {error}", file=sys.stderr)
+            failed.append(hs_mtz)
+    return failed
 
 def main():
 
@@ -171,6 +662,23 @@ def main():
         default=None,
         help="Output MTZ filename. Default: <input>_sg<ls_sg>.mtz",
     )
+    parser.add_argument(
+        "-j", "--jobs",
+        default=1,
+        help="Number of worker processes converting MTZ files in parallel",
+        type=int,
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Convert in blocks of --chunk-size reflections, for MTZs larger than memory",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default=1_000_000,
+        help="Reflections reindexed per block, and read per block with --stream",
+        type=int,
+    )
     parser.add_argument(
         "-q", "--quiet",
         action="store_true",
@@ -182,24 +690,29 @@ def main():
     if args.out is not None and len(args.hs_mtz) > 1:
         raise ValueError("--out can only be used with a single input MTZ.")
 
-    for hs_mtz in args.hs_mtz:
-        out = args.out
-        if args.ls_sg is None:
-            sg_num = rs.read_mtz(hs_mtz).spacegroup.number
-        else:
-            sg_num = gemmi.SpaceGroup(args.ls_sg).number
-        if out is None:
-            p = Path(hs_mtz)
-            out = str(p.with_name(f"{p.stem}_sg{sg_num}{p.suffix}"))
-
-        mtz = mtz_regroup_basis_change(
-            hs_mtz,
-            args.op,
-            args.ls_sg,
-            verbose=not args.quiet,
-        )
-        mtz.write_mtz(out)
-        print(f"Wrote {out}")
+    # compile the op once, for the cell and space group of the first file;
+    # files in another space group compile their own plan, and errors are
+    # reported per file
+    try:
+        plan = ReindexPlan.from_mtz(args.hs_mtz[0], args.op, args.ls_sg, verbose=not args.quiet)
+    except Exception:
+        plan = None
+
+    tasks = [
+        (hs_mtz, args.op, args.ls_sg, args.out, not args.quiet, args.stream, args.chunk_size, plan)
+        for hs_mtz in args.hs_mtz
+    ]
+    if args.jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(tasks))) as pool:
+            futures = [pool.submit(_convert_mtz_task, *task) for task in tasks]
+            results = (future.result() for future in futures)
+            failed = _report(args.hs_mtz, results)
+    else:
+        failed = _report(args.hs_mtz, (_convert_mtz_task(*task) for task in tasks))
+
+    if failed:
+        print(f"{len(failed)} of {len(tasks)} MTZ files failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+"""
+Run regroup and regroup.low_sym in one process: determine the best-match
+facet and low-symmetry subgroup from the frame geometry, and convert every
+MTZ file to that subgroup with its change-of-basis op.
+
+Each output MTZ gets a sidecar <output>.regroup.json recording the input
+file, op, and space group it was made from; outputs whose input, op, and
+space group are unchanged since the last run are skipped (see --force).
+
+Example
+-------
+regroup.pipeline e020_*.mccd.inp -sg 96 --mtz e020_{off,200ns}.mtz
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from regroup.geometrycache import GeometryCache
+from regroup.profiling import Profile, profiling, stage
+from regroup.regroup import _SG_NUMBER, analyze_facets
+
+# Bump when the stamp contents or the conversion change
+STAMP_VERSION = 2
+
+
+def best_subgroup(results):
+    """
+    Change-of-basis op, low-symmetry space group symbol, and its number
+    for the best-match (first) row of an `analyze_facets` table.
+
+    The symbol is taken from the cctbx subgroup symbol rather than the
+    number, as the subgroup may be in a non-reference setting that the op
+    does not change, e.g. 'P 2 1 1 (No. 3)' with op 'x,y,z'.
+
+    Returns
+    -------
+    (str, str, int)
+        e.g. ('a-1/4,b,c-3/8', 'P 1 21 1', 4) for
+        'P 1 21 1 (a-1/4,b,c-3/8) (No. 4)'
+    """
+    op = str(results.loc[0, ("basis_change_op", "")])
+    symbol = str(results.loc[0, ("spacegroup", "")])
+    match = _SG_NUMBER.search(symbol)
+    if match is None:
+        raise ValueError(f"Could not determine the space group number of {symbol!r}")
+    return op, symbol.split(" (", 1)[0], int(match.group(1))
+
+
+def _stamp_path(out):
+    return f"{out}.regroup.json"
+
+
+def _input_stamp(path, content_hash=False):
+    st = os.stat(path)
+    stamp = {"input": os.path.abspath(path), "size": st.st_size}
+    if content_hash:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        stamp["sha256"] = h.hexdigest()
+    else:
+        stamp["mtime_ns"] = st.st_mtime_ns
+    return stamp
+
+
+def _stamp(hs_mtz, out, op, lowsym, sg_num, content_hash=False):
+    """
+    Record of what `out` was made from, with the size and modification
+    time of `out` itself so that edited or replaced outputs are redone.
+    """
+    st = os.stat(out)
+    return {
+        "version": STAMP_VERSION,
+        **_input_stamp(hs_mtz, content_hash),
+        "op": op,
+        "symbol": lowsym,
+        "spacegroup": sg_num,
+        "output_size": st.st_size,
+        "output_mtime_ns": st.st_mtime_ns,
+    }
+
+
+def is_up_to_date(hs_mtz, out, op, lowsym, sg_num, content_hash=False):
+    """
+    Whether `out` exists and was made from `hs_mtz` in its current state
+    with `op` and space group `lowsym` (number `sg_num`).
+    """
+    try:
+        with open(_stamp_path(out)) as f:
+            stamp = json.load(f)
+        return stamp == _stamp(hs_mtz, out, op, lowsym, sg_num, content_hash)
+    except (OSError, ValueError):
+        return False
+
+
+def write_stamp(hs_mtz, out, op, lowsym, sg_num, content_hash=False):
+    path = _stamp_path(out)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_stamp(hs_mtz, out, op, lowsym, sg_num, content_hash), f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+    return path
+
+
+def run_pipeline(inp, spacegroup, mtzs, out_dir=None, force=False, content_hash=False,
+                 stream=False, chunk_size=1_000_000, verbose=True, **kwargs):
+    """
+    Determine the best-match subgroup of `spacegroup` from the geometry
+    files `inp` with `analyze_facets` (keyword arguments are passed on),
+    and convert each of `mtzs` to it with a single `ReindexPlan`.
+
+    Outputs are written next to the inputs (or to `out_dir`) as
+    <input>_sg<number>.mtz. Unless `force`, outputs that are up to date
+    with their input, op, and space group are skipped; `content_hash`
+    compares inputs by a SHA-256 of their contents instead of their size
+    and modification time. The chosen facet, op, and space group are
+    always printed; `verbose` adds the cell-volume check of the plan.
+
+    Returns
+    -------
+    (op, lowsym, sg_num, outcomes)
+        The op, space group symbol, and its number used, and for each MTZ a tuple
+        (out, status, error) with status 'written', 'up to date', or
+        'failed'.
+    """
+    results, _ = analyze_facets(inp, spacegroup, **kwargs)
+
+    # after the analysis, which loads cctbx for the subgroups
+    import gemmi
+    from regroup.low_sym import ReindexPlan, _output_path, convert_mtz
+
+    op, lowsym, sg_num = best_subgroup(results)
+    lowsym = gemmi.SpaceGroup(lowsym)
+    if lowsym.number != sg_num:
+        raise ValueError(f"Space group {lowsym.hm!r} is not No. {sg_num}")
+    lowsym = lowsym.hm
+    # always reported, as the op applied to every output; `verbose` only
+    # controls the cell-volume output of the plan
+    print("Best-match facet:", tuple(int(h) for h in results.loc[0, ("Facet", "")]))
+    print("Best-match basis-change op:", op)
+    print("Low-symmetry space group:", lowsym, f"(No. {sg_num})")
+
+    plan = None
+    outcomes = []
+    for hs_mtz in mtzs:
+        out = _output_path(hs_mtz, sg_num)
+        if out_dir is not None:
+            out = os.path.join(out_dir, os.path.basename(out))
+        if not force and is_up_to_date(hs_mtz, out, op, lowsym, sg_num, content_hash):
+            outcomes.append((out, "up to date", None))
+            continue
+
+        try:
+            with stage("reindex_mtz"):
+                if plan is None:
+                    plan = ReindexPlan.from_mtz(hs_mtz, op, lowsym, verbose=verbose)
+                convert_mtz(
+                    hs_mtz, op, lowsym, out=out, verbose=verbose,
+                    stream=stream, chunk_size=chunk_size, plan=plan,
+                )
+            write_stamp(hs_mtz, out, op, lowsym, sg_num, content_hash)
+            outcomes.append((out, "written", None))
+        except Exception as e:
+            outcomes.append((out, "failed", f"{type(e).__name__}: {e}"))
+    return op, lowsym, sg_num, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "inp",
+        nargs="+",
+        help="Precognition geometry files, .mccd.inp, or DIALS experiment file, .expt",
+    )
+    parser.add_argument("-sg", "--spacegroup", type=int, required=True, help="Parent spacegroup")
+    parser.add_argument(
+        "--mtz",
+        nargs="+",
+        required=True,
+        help="High-symmetry MTZ files to convert to the best-match subgroup",
+    )
+    parser.add_argument(
+        "--hmax",
+        default=None,
+        help="Maximal index in candidate Miller planes. Default: 1, or unbounded with --dmin",
+        type=int,
+    )
+    parser.add_argument(
+        "--dmin",
+        default=None,
+        help="Minimal d-spacing of candidate Miller planes, in Angstrom",
+        type=float,
+    )
+    parser.add_argument(
+        "--dmax",
+        default=None,
+        help="Maximal d-spacing of candidate Miller planes, in Angstrom",
+        type=float,
+    )
+    parser.add_argument(
+        "-ef",
+        "--efvector",
+        nargs=3,
+        type=float,
+        default=(0, 1, 0),
+        metavar=("efx", "efy", "efz"),
+        help="field vector in lab frame",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=1,
+        help="Number of workers for reading .inp files",
+        type=int,
+    )
+    parser.add_argument(
+        "--out-dir",
+        default=None,
+        help="Directory for the output MTZs. Default: next to each input",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Convert every MTZ, even if its output is up to date",
+    )
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="Compare inputs with the last run by contents instead of size and modification time",
+    )
+    parser.add_argument(
+        "--stream-mtz",
+        action="store_true",
+        help="Convert MTZs in blocks of --chunk-size reflections, for MTZs larger than memory",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default=1_000_000,
+        help="Reflections reindexed per block",
+        type=int,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk cache of parsed geometry",
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Write wall time per stage and counters to this JSON file",
+        type=str,
+    )
+    parser.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        help="Suppress verbose cell-volume output",
+    )
+
+    args = parser.parse_args()
+
+    hmax = args.hmax
+    if hmax is None and args.dmin is None:
+        hmax = 1
+
+    profile = Profile()
+    with profiling(profile):
+        op, lowsym, sg_num, outcomes = run_pipeline(
+            args.inp,
+            args.spacegroup,
+            args.mtz,
+            out_dir=args.out_dir,
+            force=args.force,
+            content_hash=args.hash,
+            stream=args.stream_mtz,
+            chunk_size=args.chunk_size,
+            verbose=not args.quiet,
+            hmax=hmax,
+            efvector=args.efvector,
+            jobs=args.jobs,
+            dmin=args.dmin,
+            dmax=args.dmax,
+            cache=None if args.no_cache else GeometryCache(),
+        )
+    if args.profile:
+        profile.write_json(args.profile)
+
+    failed = []
+    for hs_mtz, (out, status, error) in zip(args.mtz, outcomes):
+        if status == "written":
+            print(f"Wrote {out}")
+        elif status == "up to date":
+            print(f"Up to date {out}")
+        else:
+            print(f"Failed {hs_mtz}: {error}", file=sys.stderr)
+            failed.append(hs_mtz)
+
+    if failed:
+        print(f"{len(failed)} of {len(outcomes)} MTZ files failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
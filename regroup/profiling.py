@@ -0,0 +1,101 @@
+"""
+Per-stage timing and counters for regroup runs.
+
+Instrumented code calls `stage` and `count`, which do nothing unless a
+`Profile` is active. To profile a run:
+
+    with profiling() as profile:
+        run_regroup(...)
+    profile.write_json("profile.json")
+"""
+
+import contextlib
+import contextvars
+import json
+import time
+
+_active = contextvars.ContextVar("regroup_profile", default=None)
+
+
+class Profile():
+    """
+    Wall time per named stage and named counters of one run.
+
+    Stages may nest; the time of a stage includes that of the stages run
+    inside it. Repeated stages accumulate.
+    """
+
+    #-------------------------------------------------------------------#
+    # Constructor
+
+    def __init__(self):
+        self._stages = {}
+        self._counters = {}
+        self._start = time.perf_counter()
+
+    #-------------------------------------------------------------------#
+    # Recording Methods
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            entry = self._stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+    def count(self, name, n=1):
+        self._counters[name] = self._counters.get(name, 0) + int(n)
+
+    #-------------------------------------------------------------------#
+    # Output Methods
+
+    def to_dict(self):
+        return {
+            "total_seconds": time.perf_counter() - self._start,
+            "stages": {name: dict(entry) for name, entry in self._stages.items()},
+            "counters": dict(self._counters),
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+        return
+
+
+@contextlib.contextmanager
+def profiling(profile=None):
+    """
+    Make `profile` (a new Profile by default) the active profile in this
+    context.
+    """
+    if profile is None:
+        profile = Profile()
+    token = _active.set(profile)
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+
+def stage(name):
+    """
+    Time the enclosed block as stage `name` of the active profile.
+    """
+    profile = _active.get()
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.stage(name)
+
+
+def count(name, n=1):
+    """
+    Add `n` to counter `name` of the active profile.
+    """
+    profile = _active.get()
+    if profile is not None:
+        profile.count(name, n)
@@ -12,34 +12,35 @@ All 1D arrays are treated as 1D row vectors.
 """
 
 import argparse
-import itertools
-import pandas as pd
-import gemmi
+import re
 import numpy as np
-from regroup import FrameGeometry
-from regroup.framegeometry import get_orthogonalization_matrix
-from regroup import ExptList
+from regroup.framegeometry import read_inp_files
 from regroup.geom_utils import *
-from cctbx import sgtbx
-from cctbx.sgtbx import subgroups
-from regroup.low_sym import _has_any, cctbx_cb_op_to_rs_op
+from regroup.accumulator import FacetAccumulator
+from regroup.geometrycache import GeometryCache
+from regroup.profiling import Profile, count, profiling, stage
+from regroup.subgrouptable import get_subgroup_table, _extract_basis_change_op
+
+# pandas, gemmi (via regroup.low_sym) and dxtbx (via regroup.ExptList) are
+# imported inside the functions that use them, to keep startup fast.
 
 def print_fsa_table(parent_sg, vec=None, O=None, file=None, den=None, opnums=None):
     """
     Print FSA table using Gemmi operation ordering and 
     crystal Euclidean space metric tensor.
+
+    The FSA of all symops is computed at once by `regroup.fsa.compute_fsa`.
     """
-    sg = gemmi.SpaceGroup(str(parent_sg))
-    ops = sg.operations().sym_ops
+    from regroup.fsa import compute_fsa
 
     field = np.asarray(vec, dtype=float)
-
-    G = O.T @ O
+    table = compute_fsa(parent_sg, field[None, :], O, den=den)
+    n_ops = len(table["symop"])
 
     field_display = np.array(field, dtype=float)/np.linalg.norm(field)
     
     if opnums is None:
-        opnums = list(range(len(ops)))
+        opnums = list(range(n_ops))
     elif isinstance(opnums, str):
         opnums = [int(x) for x in opnums.replace(",", " ").split()]
     else:
@@ -61,80 +62,65 @@ def print_fsa_table(parent_sg, vec=None, O=None, file=None, den=None, opnums=Non
     print("-" * len(header), file=file)
 
     for opnum in opnums:
-        if opnum < 0 or opnum >= len(ops):
+        if opnum < 0 or opnum >= n_ops:
             print(
-                f"Skipping invalid opnum {opnum}; valid range is 0 to {len(ops) - 1}.",
+                f"Skipping invalid opnum {opnum}; valid range is 0 to {n_ops - 1}.",
                 file=file,
             )
             continue
 
-        op = ops[opnum]
-        R = gemmi_to_rot(op, den=den)
-
-        rotated = R @ field
-
-        # Metric-aware version of fsa = -v dot Rv
-        fsa = -cosine_metric(field, rotated, G)
-        angle_deg = angle_metric(field, rotated, G)
-
-        # not broken means the rotated fractional vector represents the same
-        # physical direction as the original. Use metric norm for tolerance.
-        broken = not metric_close(rotated, field, G, atol=1e-5)
+        # Metric-aware fsa = -v dot Rv; not broken means the rotated
+        # fractional vector represents the same physical direction as the
+        # original, within the metric norm.
+        fsa = table["fsa"][opnum, 0]
+        angle_deg = table["angle_deg"][opnum, 0]
+        broken = bool(table["broken"][opnum, 0])
 
         print(
             f"{fsa:10.5f}  "
             f"{angle_deg:10.3f}  "
             f"{str(broken):>8s}  "
             f"{opnum:6d}  "
-            f"{op.triplet():25s}",
+            f"{table['symop'][opnum]:25s}",
             file=file,
         )
 
-def _extract_basis_change_op(symbol_and_number):
-    """
-    Extract the regroup/cctbx basis-change operator embedded in cctbx's
-    symbol_and_number() display. If no operator is present, use identity.
-    """
-    s = str(symbol_and_number)
-    if " (No." in s:
-        s = s.split(" (No.", 1)[0]
-    if "(" in s and ")" in s:
-        return s.rsplit("(", 1)[1].split(")", 1)[0].strip()
-    return "x,y,z"
-
 def _op_rot(op):
     return np.array(op.rot, dtype=float) / float(getattr(op, "DEN", 24))
 
 
+def get_spacegroups(facets, parent_sg, O, orbits=True):
+    """
+    Get reduced symmetry spacegroups for a crystal aligned on each of `facets`.
+
+    The subgroups of `parent_sg` are enumerated once and every facet is
+    tested against all of them in one batch. With `orbits`, facets related
+    by the parent point group are tested once per orbit and the result is
+    mapped onto each member by conjugation. The cctbx subgroup in each
+    result is None when the subgroups come from the subgroup database.
+    """
+    with stage("subgroups"):
+        table = get_subgroup_table(parent_sg)
+
+        if orbits:
+            best = table.best_subgroups_for_facets(facets, O)
+        else:
+            #generate fractional E field guesses, on which to apply rotation matrices
+            #for checking subgroup validity. 
+            guess_e_field_unit_vectors = facet_normals_to_crystal_frame(facets, O)
+            best = table.best_subgroups(guess_e_field_unit_vectors)
+
+    groups = table.groups
+    return [
+        (table.symbols[i], int(table.n_smx[i]), groups[i] if groups else None, table.cb_ops[i])
+        for i in best
+    ]
+
 def get_spacegroup(facet, parent_sg, O):
     """
     Get reduced symmetry spacegroup for crystal aligned on `facet`.
     """
-
-    #generate a fractional E field guess, on which to apply rotation matrices
-    #for checking subgroup validity. 
-    guess_e_field_unit_vector = facet_normal_to_crystal_frame(facet, O)
-
-    parent = sgtbx.space_group_info(parent_sg)
-    subgrs = subgroups.subgroups(parent).groups_parent_setting()
-
-    possible = []
-    for subgroup in subgrs:
-        subgroup_info = sgtbx.space_group_info(group=subgroup)
-        valid = True
-
-        #check that all the subgroup operations preserve the vector orientation. 
-        for op in subgroup.smx():
-            rot_mat = np.array(op.r().as_double()).reshape((3, 3))
-            valid &= np.allclose(rot_mat @ guess_e_field_unit_vector, guess_e_field_unit_vector)
-            # is the operation above correct?
-        if valid:
-            sg_symbol = subgroup_info.symbol_and_number()
-            cb_op = _extract_basis_change_op(sg_symbol)
-            possible.append([subgroup.n_smx(), sg_symbol, subgroup, cb_op])
-
-    possible = sorted(possible)
-    return possible[-1][1], possible[-1][0], possible[-1][2], possible[-1][3]
+    return get_spacegroups([facet], parent_sg, O)[0]
 
 def mean_vec(values, ndigits=4):
     """
@@ -144,123 +130,520 @@ def mean_vec(values, ndigits=4):
     v = arr.mean(axis=0)
     return fmt_vec(v, ndigits=ndigits)
 
-def run_regroup(inp, spacegroup, hmax=1, efvector=(0, -1, 0), filename=None, fsa=False, opnums=None):
+def compute_facet_angles(facets, Astars, efvector, O):
     """
-    Computes A matrix and angle between vector and facet normals.
-    We deal with four coordinate frames: 
-        - the lab Cartesian frame. 
-        - the crystal Cartesian frame.
-        - the crystal fractional coordinate frame, 
-          which we utilize for symmetry breaking and visualization. 
-        - the reciprocal lattice. 
-    Given these, we rely on the following formal statements: 
-        - Astar transforms facet normals of reciprocal lattice hkls 
-          into the lab Cartesian frame.
-            - This allows us to calculate angles between the E field
-              and facet normals in the lab frame. 
-        - The metric tensor O^TO transforms reciprocal lattice points, i.e.
-          Miller plane normals, into fractional coordinates.  
-            - This allows us to rotate/translate facet normals and 
-              determine preserved/broken symmetries. 
-              
+    Compute the angle between every facet normal and the field vector on
+    every frame in a few batched operations.
+
+    Parameters
+    ----------
+    facets : array_like, shape (F, 3)
+        Miller indices of the candidate facets.
+    Astars : array_like, shape (N, 3, 3)
+        Stacked A* matrices, one per frame.
+    efvector : array_like, shape (3,)
+        Field vector in the lab frame.
+    O : np.ndarray, shape (3, 3)
+        Orthogonalization matrix.
+
+    Returns
+    -------
+    angles : np.ndarray, shape (N, F)
+        Lab-frame angles in degrees.
+    ef_cryst : np.ndarray, shape (N, 3)
+        Field vector in crystal fractional coordinates for each frame.
+    n_frac : np.ndarray, shape (F, 3)
+        Facet normals in crystal fractional coordinates.
     """
-    facets = list(itertools.product(np.arange(-hmax, hmax + 1), repeat=3))
-    facets.remove((0, 0, 0))
+    hkls = np.asarray(facets, dtype=float).reshape(-1, 3)
+    Astars = np.asarray(Astars, dtype=float).reshape(-1, 3, 3)
+    efvector = np.asarray(efvector, dtype=float)
 
-    l_facets = []
-    l_images = []
-    l_angles = []
-    l_ef_cryst = []
+    with stage("facet_angles"):
+        normals = get_normal_vectors(hkls, Astars)
+        angles = np.rad2deg(angle_batch(normals, efvector))
+        n_frac = facet_normals_to_crystal_frame(hkls, O)
+        ef_cryst = lab_vec_to_crystal_batch(efvector, Astars)
+    count("angles_computed", angles.size)
 
-    if spacegroup is None:
-        raise ValueError("Please provide parent spacegroup with -sg / --spacegroup")
+    return angles, ef_cryst, n_frac
 
-    precog = False
-    dials = False
-    Astars = []
-    images = []
+def validate_facet_angles(angles, ef_cryst, n_frac, O, rtol=1e-2):
+    """
+    Check that the lab-frame angles from `compute_facet_angles` match the
+    same angles computed in crystal fractional coordinates.
+
+    Returns
+    -------
+    max_discrepancy : float
+        Largest absolute difference between the two angle matrices, in
+        degrees.
+    frames : np.ndarray
+        Indices of the frames with any facet outside `rtol`.
+    """
+    angles1 = angle_metric_matrix(ef_cryst, n_frac, O.T @ O)
+    if angles.size == 0:
+        return 0.0, np.array([], dtype=int)
+    max_discrepancy = float(np.abs(angles - angles1).max())
+    frames = np.flatnonzero(~np.isclose(angles, angles1, rtol=rtol).all(axis=1))
+    return max_discrepancy, frames
+
+def report_validation(max_discrepancy, frames, images, file=None):
+    """
+    Print the result of `validate_facet_angles` and raise if any frame
+    failed.
+    """
+    print(f"Validation: max angle discrepancy between lab and crystal frames: {max_discrepancy:.6f} deg", file=file)
+    if len(frames) == 0:
+        return
+    shown = ", ".join(str(images[i]) for i in frames[:10])
+    more = f" and {len(frames) - 10} more" if len(frames) > 10 else ""
+    raise RuntimeError(
+        f"Lab-frame and crystal-frame angles disagree on {len(frames)} frame(s): {shown}{more}"
+    )
 
-    if inp[0][-4:] == ".inp":
-        precog = True
-        for _inp in inp:
-            geometry = FrameGeometry(_inp)
-            Astars.append(geometry.get_reciprocal_Amatrix())
-            images.append(_inp)
+def _accumulate_chunks(Astars, chunk_size, update, validate=False, images=None):
+    """
+    Call `update(chunk)` on each block of `chunk_size` frames of `Astars`.
 
-    dials_expts = None
-    if inp[0][-5:] == ".expt":
-        dials = True
-        dials_expts = ExptList(inp[0])
-        Astars.extend(dials_expts.get_reciprocal_Amatrices())
-        images.extend(dials_expts.get_image_filenames())
+    With `validate`, `update` returns the maximal angle discrepancy of its
+    chunk and the indices, within the chunk, of frames that fail the
+    lab/crystal-frame check; these are collected over all chunks and
+    passed to `report_validation`.
+    """
+    max_discrepancy = 0.0
+    bad_frames = []
+    for start in range(0, len(Astars), chunk_size):
+        checked = update(Astars[start:start + chunk_size])
+        if validate:
+            chunk_max, chunk_frames = checked
+            max_discrepancy = max(max_discrepancy, chunk_max)
+            bad_frames.append(np.asarray(chunk_frames, dtype=int) + start)
+
+    if validate:
+        frames = np.concatenate(bad_frames) if bad_frames else np.array([], dtype=int)
+        report_validation(max_discrepancy, frames, images if images is not None else range(len(Astars)))
+
+def stream_facet_stats(facets, Astars, efvector, O, chunk_size=4096, validate=False, images=None):
+    """
+    Per-facet angle statistics computed chunk by chunk over the frames.
 
-    if not dials and not precog:
-        raise ValueError("File extension unrecognized. Please enter .inp or .expt files.")
+    Memory scales with the number of facets and `chunk_size`, not with
+    the number of frames. Returns the same table as grouping the
+    long-form (facet, image) table by facet. With `validate`, each chunk
+    is also checked with `validate_facet_angles`.
+    """
+    facets = sorted(facets)
+    acc = FacetAccumulator(len(facets))
 
-    efvector = np.array(efvector, dtype=float)
-    
-    if precog:
-        geom = FrameGeometry(inp[0])
-        O = geom.get_orthogonalization_matrix().T
-    elif dials:
-        O = dials_expts.get_orthogonalization_matrix().T
-        
-    for facet in facets:
-        hkl = np.array(facet)
-
-        if np.gcd.reduce(hkl) > 1:
-            continue
+    def update(chunk):
+        angles, ef_cryst, n_frac = compute_facet_angles(facets, chunk, efvector, O)
+        with stage("aggregate"):
+            acc.update(angles, ef_cryst)
+        if validate:
+            return validate_facet_angles(angles, ef_cryst, n_frac, O)
 
-        for i, Astar in enumerate(Astars):
-            normal = get_normal_vector(hkl, Astar)
-            theta = np.rad2deg(angle(normal, efvector))
-            n_frac = facet_normal_to_crystal_frame(facet, O)
+    _accumulate_chunks(Astars, chunk_size, update, validate=validate, images=images)
+    return _facet_stats_table(facets, acc)
 
-            #check that Euclidean coordinate angle computation 
-            #matches fractional coordinate space.
-            ef_cryst = lab_vec_to_crystal(efvector, Astar)
-            theta1 = angle_metric(ef_cryst, n_frac, O.T @ O)
-            assert np.allclose(theta, theta1, rtol=1e-2)
+def query_facet_stats(facets, Astars, efvector, O, max_angle, chunk_size=4096, validate=False, images=None):
+    """
+    Per-facet angle statistics over only the frames on which the facet
+    normal lies within `max_angle` degrees of the field vector.
+
+    Facet normals are indexed once in a `FacetIndex`, and each frame's
+    field vector becomes a radius query, so the cost per frame is
+    sublinear in the number of facets. Facets that are never within
+    `max_angle` are left out of the table, and the count column is the
+    number of frames on which each facet was within range.
+    """
+    from regroup.facetindex import FacetIndex
+
+    facets = sorted(facets)
+    hkls = np.asarray(facets, dtype=float)
+    index = FacetIndex(facets, O)
+    acc = FacetAccumulator(len(facets))
+
+    def update(chunk):
+        with stage("facet_angles"):
+            ef_cryst = lab_vec_to_crystal_batch(efvector, chunk)
+            frames, facet_idx, angles_cryst = index.query_radius(ef_cryst, max_angle)
+
+            # lab-frame angles of the hits, as in compute_facet_angles
+            normals = np.einsum("mj,mij->mi", hkls[facet_idx], chunk[frames])
+            angles = np.rad2deg(angle_batch(normals, efvector))
+        count("angles_computed", angles.size)
+        with stage("aggregate"):
+            acc.update_pairs(facet_idx, angles, ef_cryst[frames])
+
+        if validate:
+            if not len(angles):
+                return 0.0, []
+            bad = ~np.isclose(angles, angles_cryst, rtol=1e-2)
+            return float(np.abs(angles - angles_cryst).max()), np.unique(frames[bad])
+
+    _accumulate_chunks(Astars, chunk_size, update, validate=validate, images=images)
+    if not acc.count.any():
+        raise ValueError(f"No facet normal is within {max_angle} degrees of the field vector on any frame")
+    return _facet_stats_table(facets, acc)
+
+def topk_facet_stats(facets, Astars, efvector, O, k, chunk_size=4096, validate=False, images=None):
+    """
+    Per-facet angle statistics over only the frames on which the facet is
+    among the `k` closest to the field vector.
 
-            l_facets.append(facet)
-            l_images.append(images[i])
-            l_angles.append(theta)
-            l_ef_cryst.append(fmt_vec(ef_cryst))
+    The k best facets of each frame are picked with a partial selection
+    (argpartition) rather than a full sort. Facets that are never among
+    the k best are left out of the table, and the count column is the
+    number of frames on which each facet was.
+    """
+    facets = sorted(facets)
+    k = min(int(k), len(facets))
+    acc = FacetAccumulator(len(facets))
+
+    def update(chunk):
+        angles, ef_cryst, n_frac = compute_facet_angles(facets, chunk, efvector, O)
+        with stage("aggregate"):
+            best = np.argpartition(angles, k - 1, axis=1)[:, :k]
+            acc.update_pairs(best.ravel(), np.take_along_axis(angles, best, axis=1).ravel(), np.repeat(ef_cryst, k, axis=0))
+        if validate:
+            return validate_facet_angles(angles, ef_cryst, n_frac, O)
+
+    _accumulate_chunks(Astars, chunk_size, update, validate=validate, images=images)
+    return _facet_stats_table(facets, acc)
+
+def select_top_k(results, k):
+    """
+    Keep the `k` rows of a facet table with the smallest mean angle,
+    selected with argpartition. The rows are not sorted.
+    """
+    if k is None or len(results) <= k:
+        return results
+    mean = results[("Angle", "mean")].to_numpy()
+    return results.iloc[np.argpartition(mean, k - 1)[:k]]
 
-    df = pd.DataFrame(
-        {
-            "Facet": l_facets,
-            "Image": l_images,
-            "Angle": l_angles,
-            "ef_crystal": l_ef_cryst,
-        }
-    )
+def _facet_stats_table(facets, acc):
+    """
+    Table of a FacetAccumulator, laid out as the groupby of the long-form
+    (facet, image) table, plus the unrounded mean field vector as
+    ("ef_crystal", "mean"). Facets without observations are left out.
+    """
+    import pandas as pd
 
-    results = df.groupby("Facet").agg(
+    seen = acc.count > 0
+    index = pd.Index([f for f, s in zip(facets, seen) if s], name="Facet", tupleize_cols=False)
+    ef_mean = acc.ef_mean_tuples()
+    return pd.DataFrame(
         {
-            "Angle": ["mean", "std", "count"],
-            "ef_crystal": mean_vec,
-        }
+            ("Angle", "mean"): acc.mean[seen],
+            ("Angle", "std"): acc.std[seen],
+            ("Angle", "count"): acc.count[seen],
+            ("ef_crystal", "mean_vec"): [v for v, s in zip(ef_mean, seen) if s],
+            ("ef_crystal", "mean"): [tuple(v) for v in acc.ef_mean[seen]],
+        },
+        index=index,
     )
 
+def load_geometry(inp, jobs=1, executor="thread", cache=None):
+    """
+    Read frame geometry from Precognition .inp files or a DIALS .expt file.
+
+    Parameters
+    ----------
+    inp : list of str
+        .inp files, or a single .expt file
+    jobs : int
+        Number of workers for reading .inp files
+    executor : {"thread", "process"}
+        Worker pool type for reading .inp files
+    cache : GeometryCache, optional
+        On-disk cache of parsed geometry. On a hit the files are not parsed.
+
+    Returns
+    -------
+    Astars : np.ndarray, shape (N, 3, 3)
+        A* matrices, one per frame
+    images : list of str
+        Image (or .inp) filename of each frame
+    O : np.ndarray, shape (3, 3)
+        Orthogonalization matrix
+    """
+    with stage("load_geometry"):
+        if cache is None:
+            return _parse_geometry(inp, jobs=jobs, executor=executor)
+
+        cached = cache.get(inp)
+        if cached is not None:
+            count("geometry_cache_hits")
+            return cached
+        Astars, images, O = _parse_geometry(inp, jobs=jobs, executor=executor)
+        cache.put(inp, Astars, images, O)
+        return Astars, images, O
+
+def _parse_geometry(inp, jobs=1, executor="thread"):
+    if inp[0][-4:] == ".inp":
+        Astars, images, O = read_inp_files(inp, jobs=jobs, executor=executor)
+        count("frames_parsed", len(Astars))
+        return Astars, images, O.T
+
+    if inp[0][-5:] == ".expt":
+        from regroup import ExptList
+        with stage("read_expt"):
+            dials_expts = ExptList(inp[0])
+            Astars = np.asarray(dials_expts.get_reciprocal_Amatrices(), dtype=float).reshape(-1, 3, 3)
+            images = list(dials_expts.get_image_filenames())
+            O = dials_expts.get_orthogonalization_matrix().T
+        count("frames_parsed", len(Astars))
+        return Astars, images, O
+
+    raise ValueError("File extension unrecognized. Please enter .inp or .expt files.")
+
+def analyze_facets(inp, spacegroup, hmax=1, efvector=(0, -1, 0), jobs=1, executor="thread",
+                   stream=False, chunk_size=4096, validate=False, dmin=None, dmax=None,
+                   max_angle=None, top_k=None, cache=None, long_form=False,
+                   return_geometry=False):
+    """
+    Run the facet and subgroup analysis of `run_regroup` without printing.
+
+    Per-facet statistics are accumulated with a `FacetAccumulator`, over
+    all frames at once or, with `stream`, `chunk_size` frames at a time.
+    With `long_form`, they are instead aggregated from the long-form
+    (facet, image) DataFrame with pandas, as in earlier versions; this
+    gives the same table (to ~1e-13) but is several times slower.
+
+    Returns
+    -------
+    results : pd.DataFrame
+        Per-facet table sorted by mean angle, with the crystal-frame facet
+        normal, subgroup, number of symops and basis-change op of each facet.
+    O : np.ndarray, shape (3, 3)
+        Orthogonalization matrix
+    Astars, images : np.ndarray, list of str
+        Only with `return_geometry`: the frame geometry the table was
+        computed from, as returned by `load_geometry`, e.g. for `fsa_tables`
+    """
+    import pandas as pd
+
+    if spacegroup is None:
+        raise ValueError("Please provide parent spacegroup with -sg / --spacegroup")
+
+    if cache is True:
+        cache = GeometryCache()
+    elif cache is False:
+        cache = None
+    Astars, images, O = load_geometry(inp, jobs=jobs, executor=executor, cache=cache)
+    efvector = np.array(efvector, dtype=float)
+
+    with stage("generate_facets"):
+        facets = [tuple(facet) for facet in generate_facets(hmax, O=O, dmin=dmin, dmax=dmax)]
+    count("facets_evaluated", len(facets))
+
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be at least 1")
+
+    if max_angle is not None:
+        results = query_facet_stats(
+            facets, Astars, efvector, O, max_angle,
+            chunk_size=chunk_size, validate=validate, images=images,
+        )
+    elif top_k is not None:
+        results = topk_facet_stats(
+            facets, Astars, efvector, O, top_k,
+            chunk_size=chunk_size, validate=validate, images=images,
+        )
+    elif not long_form:
+        results = stream_facet_stats(
+            facets, Astars, efvector, O, chunk_size=chunk_size if stream else max(len(Astars), 1),
+            validate=validate, images=images,
+        )
+    else:
+        angles, ef_cryst, n_frac = compute_facet_angles(facets, Astars, efvector, O)
+        if validate:
+            report_validation(*validate_facet_angles(angles, ef_cryst, n_frac, O), images)
+
+        with stage("aggregate"):
+            # long-form table, facet-major as in the per-pair loop
+            n_frames = len(Astars)
+            l_facets = [facet for facet in facets for _ in range(n_frames)]
+            l_images = list(images) * len(facets)
+            l_angles = angles.T.ravel()
+            l_ef_cryst = [fmt_vec(v) for v in ef_cryst] * len(facets)
+
+            df = pd.DataFrame(
+                {
+                    "Facet": l_facets,
+                    "Image": l_images,
+                    "Angle": l_angles,
+                    "ef_crystal": l_ef_cryst,
+                }
+            )
+
+            results = df.groupby("Facet").agg(
+                {
+                    "Angle": ["mean", "std", "count"],
+                    "ef_crystal": mean_vec,
+                }
+            )
+            # every facet is seen on every frame
+            results[("ef_crystal", "mean")] = [tuple(ef_cryst.mean(axis=0))] * len(results)
+
+    # subgroups are only determined for the facets kept here
+    results = select_top_k(results, top_k)
     results.sort_values(("Angle", "mean"), inplace=True)
     results.reset_index(inplace=True)
-    mv = results.loc[0, "ef_crystal"][0]
-    print("Fractional coordinates of field vector:", mv)
-
     results["facet_normal_crystal"] = results.Facet.apply(
         lambda hkl: fmt_vec(facet_normal_to_crystal_frame(hkl, O))
     )
 
-    sg_results = results.Facet.apply(get_spacegroup, parent_sg=spacegroup, O=O).tolist()
+    sg_results = get_spacegroups(results.Facet.tolist(), spacegroup, O)
     results["spacegroup"] = [item[0] for item in sg_results]
     results["n_symops"] = [item[1] for item in sg_results]
     results["basis_change_op"] = [item[3] for item in sg_results]
+
+    if return_geometry:
+        return results, O, Astars, images
+    return results, O
+
+_SG_NUMBER = re.compile(r"\(No\. (\d+)\)\s*$")
+
+def results_to_columns(results, O):
+    """
+    Typed columns of an `analyze_facets` table.
+
+    Returns
+    -------
+    dict of np.ndarray
+        h, k, l, angle_count, sg_number, n_symops : int64
+        angle_mean, angle_std, ef_x, ef_y, ef_z, normal_x, normal_y,
+        normal_z : float64
+        sg_symbol, cb_op : str
+
+        ef_* is the mean field vector and normal_* the facet normal, both
+        in crystal fractional coordinates as in the printed table, but not
+        rounded.
+    """
+    hkl = np.array(results[("Facet", "")].tolist(), dtype=np.int64).reshape(-1, 3)
+    ef = np.array(results[("ef_crystal", "mean")].tolist(), dtype=float).reshape(-1, 3)
+    normals = facet_normals_to_crystal_frame(hkl, O)
+    symbols = [str(s) for s in results[("spacegroup", "")]]
+    numbers = [_SG_NUMBER.search(s) for s in symbols]
+    return {
+        "h": hkl[:, 0],
+        "k": hkl[:, 1],
+        "l": hkl[:, 2],
+        "angle_mean": results[("Angle", "mean")].to_numpy(dtype=float),
+        "angle_std": results[("Angle", "std")].to_numpy(dtype=float),
+        "angle_count": results[("Angle", "count")].to_numpy(dtype=np.int64),
+        "ef_x": ef[:, 0],
+        "ef_y": ef[:, 1],
+        "ef_z": ef[:, 2],
+        "normal_x": normals[:, 0],
+        "normal_y": normals[:, 1],
+        "normal_z": normals[:, 2],
+        "sg_number": np.array([int(m.group(1)) if m else -1 for m in numbers], dtype=np.int64),
+        "sg_symbol": np.array(symbols, dtype=str),
+        "n_symops": results[("n_symops", "")].to_numpy(dtype=np.int64),
+        "cb_op": np.array([str(op) for op in results[("basis_change_op", "")]], dtype=str),
+    }
+
+def regroup_columns(inp, spacegroup, **kwargs):
+    """
+    Run the analysis of `run_regroup` without printing and return its
+    results as typed columns (see `results_to_columns`). Keyword arguments
+    are passed to `analyze_facets`.
+    """
+    return results_to_columns(*analyze_facets(inp, spacegroup, **kwargs))
+
+def write_columns(columns, path):
+    """
+    Write the columns of `results_to_columns` to an uncompressed .npz
+    file, or a Parquet file (.parquet, requires pyarrow).
+    """
+    if path.endswith(".parquet"):
+        import pandas as pd
+        pd.DataFrame(columns).to_parquet(path, index=False)
+    elif path.endswith(".npz"):
+        with open(path, "wb") as f:
+            np.savez(f, **columns)
+    else:
+        raise ValueError(f"Unrecognized output format for {path}. Please use .npz or .parquet")
+
+def fsa_tables(spacegroup, results, O, Astars, images, efvector=(0, -1, 0), den=None):
+    """
+    FSA of every symop of `spacegroup` against the facet normals of an
+    `analyze_facets` table (S x F), the field vector of each of the frames
+    `Astars` (S x N), and the mean field vector (S x 1), for `write_fsa`.
+
+    `Astars` and `images` are the geometry the table was computed from, as
+    returned by `analyze_facets(..., return_geometry=True)`.
+    """
+    from regroup.fsa import compute_fsa
+
+    ef_frames = lab_vec_to_crystal_batch(np.array(efvector, dtype=float), Astars)
+
+    columns = results_to_columns(results, O)
+    hkl = np.stack([columns["h"], columns["k"], columns["l"]], axis=1)
+    normals = np.stack([columns["normal_x"], columns["normal_y"], columns["normal_z"]], axis=1)
+    mean_ef = np.array(results.loc[0, ("ef_crystal", "mean_vec")], dtype=float)
+
+    with stage("fsa"):
+        return {
+            "facets": {**compute_fsa(spacegroup, normals, O, den=den), "hkl": hkl, "normal": normals},
+            "frames": {
+                **compute_fsa(spacegroup, ef_frames, O, den=den),
+                "ef": ef_frames,
+                "images": np.asarray(images, dtype=str),
+            },
+            "mean": {**compute_fsa(spacegroup, mean_ef[None, :], O, den=den), "ef": mean_ef},
+        }
+
+def run_regroup(inp, spacegroup, hmax=1, efvector=(0, -1, 0), filename=None, fsa=False, opnums=None,
+                jobs=1, executor="thread", stream=False, chunk_size=4096, validate=False,
+                dmin=None, dmax=None, max_angle=None, top_k=None, cache=None, output=None,
+                fsa_output=None, long_form=False):
+    """
+    Computes A matrix and angle between vector and facet normals.
+    We deal with four coordinate frames: 
+        - the lab Cartesian frame. 
+        - the crystal Cartesian frame.
+        - the crystal fractional coordinate frame, 
+          which we utilize for symmetry breaking and visualization. 
+        - the reciprocal lattice. 
+    Given these, we rely on the following formal statements: 
+        - Astar transforms facet normals of reciprocal lattice hkls 
+          into the lab Cartesian frame.
+            - This allows us to calculate angles between the E field
+              and facet normals in the lab frame. 
+        - The metric tensor O^TO transforms reciprocal lattice points, i.e.
+          Miller plane normals, into fractional coordinates.  
+            - This allows us to rotate/translate facet normals and 
+              determine preserved/broken symmetries. 
+              
+    """
+    import pandas as pd
+    from regroup.low_sym import cctbx_cb_op_to_rs_op
+
+    results, O, Astars, images = analyze_facets(
+        inp, spacegroup, hmax=hmax, efvector=efvector, jobs=jobs, executor=executor,
+        stream=stream, chunk_size=chunk_size, validate=validate, dmin=dmin, dmax=dmax,
+        max_angle=max_angle, top_k=top_k, cache=cache, long_form=long_form,
+        return_geometry=True,
+    )
+    if output:
+        with stage("write_columns"):
+            write_columns(results_to_columns(results, O), output)
+    if fsa_output:
+        from regroup.fsa import write_fsa
+        tables = fsa_tables(spacegroup, results, O, Astars, images, efvector=efvector)
+        write_fsa(tables, fsa_output)
+
+    mv = results.loc[0, "ef_crystal"][0]
+    print("Fractional coordinates of field vector:", mv)
     
     fsa_vec = np.array(mv)
 
     #compute and display change-of-basis op and transformed hkl.
-    best_cb_op = sg_results[0][3]
+    best_cb_op = results.loc[0, "basis_change_op"][0]
     cb = cctbx_cb_op_to_rs_op(best_cb_op)
     fv = results.loc[0, "Facet"][0]
     new_fv_hkl = fv @ _op_rot(cb)
@@ -271,7 +654,7 @@ def run_regroup(inp, spacegroup, hmax=1, efvector=(0, -1, 0), filename=None, fsa
     print("Best-match facet:", fv)
     print("Transformed best-match facet:", new_fv_hkl)
 
-    with pd.option_context('display.max_rows', None, 'display.max_columns', None):  # more 
+    with stage("report"), pd.option_context('display.max_rows', None, 'display.max_columns', None):  # more 
         print(results)
         if fsa:
             print_fsa_table(spacegroup, fsa_vec, O=O, opnums=opnums)
@@ -300,10 +683,23 @@ def main():
     parser.add_argument("-sg", "--spacegroup", type=int, help="Parent spacegroup")
     parser.add_argument(
         "--hmax",
-        default=1,
-        help="Maximal index in candidate Miller planes",
+        default=None,
+        help="Maximal index in candidate Miller planes. Default: 1, or unbounded with --dmin",
         type=int,
     )
+    parser.add_argument(
+        "--dmin",
+        default=None,
+        help="Minimal d-spacing of candidate Miller planes, in Angstrom.\n"
+             "Also bounds the index range along each axis, so --hmax can be large",
+        type=float,
+    )
+    parser.add_argument(
+        "--dmax",
+        default=None,
+        help="Maximal d-spacing of candidate Miller planes, in Angstrom",
+        type=float,
+    )
     parser.add_argument(
         "-ef",
         "--efvector",
@@ -324,6 +720,93 @@ def main():
         default=None,
         help="FSA parent symop indices. Accepts space- or comma-separated values.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        default=1,
+        help="Number of workers for reading .inp files",
+        type=int,
+    )
+    parser.add_argument(
+        "--executor",
+        default="thread",
+        choices=("thread", "process"),
+        help="Worker pool for --jobs: threads for slow (e.g. network) storage, processes for parsing",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Accumulate per-facet statistics over chunks of frames, with memory independent of the number of frames",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default=4096,
+        help="Number of frames per chunk with --stream",
+        type=int,
+    )
+    parser.add_argument(
+        "--long-form",
+        action="store_true",
+        help="Aggregate per-facet statistics from the long-form (facet, frame) table with pandas,\n"
+             "as in earlier versions. Slower; the default gives the same table to ~1e-13",
+    )
+    parser.add_argument(
+        "--max-angle",
+        default=None,
+        help="Only consider facets whose normal is within this many degrees of the field vector,\n"
+             "using a spatial index of facet normals (requires scipy). Statistics cover the\n"
+             "frames within range",
+        type=float,
+    )
+    parser.add_argument(
+        "--top-k",
+        default=None,
+        help="Keep only the k facets closest to the field vector on each frame, and the k best\n"
+             "facets overall; subgroups are only determined for those",
+        type=int,
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Cross-check lab-frame angles against crystal-frame angles and report discrepancies",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Also write machine-readable per-facet results (.npz, or .parquet with pyarrow)",
+        type=str,
+    )
+    parser.add_argument(
+        "--fsa-output",
+        default=None,
+        help="Write the FSA, angle, and broken flag of every parent symop against every facet\n"
+             "normal, every frame's field vector, and the mean field vector to this .npz file",
+        type=str,
+    )
+    parser.add_argument(
+        "--profile",
+        default=None,
+        help="Write wall time per stage and counters (frames parsed, facets evaluated,\n"
+             "subgroups tested, symops checked, ...) to this JSON file",
+        type=str,
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk cache of parsed geometry.\n"
+             "The cache lives in $REGROUP_CACHE_DIR, or ~/.cache/regroup",
+    )
+    parser.add_argument(
+        "--cache-size",
+        default=256,
+        help="Size limit of the geometry cache in MB; least recently used entries are evicted",
+        type=float,
+    )
+    parser.add_argument(
+        "--cache-hash",
+        action="store_true",
+        help="Key the geometry cache by file contents instead of size and modification time",
+    )
     parser.add_argument(
         "--filename",
         default=None,
@@ -333,16 +816,38 @@ def main():
 
     args = parser.parse_args()
 
-    run_regroup(
-        inp=args.inp,
-        spacegroup=args.spacegroup,
-        hmax=args.hmax,
-        efvector=args.efvector,
-        facets=facets,
-        filename=args.filename,
-        fsa=args.fsa,
-        opnums=args.opnums,
-    )
+    hmax = args.hmax
+    if hmax is None and args.dmin is None:
+        hmax = 1
+
+    profile = Profile()
+    with profiling(profile):
+        run_regroup(
+            inp=args.inp,
+            spacegroup=args.spacegroup,
+            hmax=hmax,
+            efvector=args.efvector,
+            filename=args.filename,
+            fsa=args.fsa,
+            opnums=args.opnums,
+            jobs=args.jobs,
+            executor=args.executor,
+            stream=args.stream,
+            chunk_size=args.chunk_size,
+            validate=args.validate,
+            dmin=args.dmin,
+            dmax=args.dmax,
+            max_angle=args.max_angle,
+            top_k=args.top_k,
+            output=args.output,
+            fsa_output=args.fsa_output,
+            long_form=args.long_form,
+            cache=None if args.no_cache else GeometryCache(
+                max_bytes=args.cache_size * 2**20, content_hash=args.cache_hash,
+            ),
+        )
+    if args.profile:
+        profile.write_json(args.profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
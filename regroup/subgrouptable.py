@@ -0,0 +1,461 @@
+"""
+Subgroup tables for parent space groups, and a prebuilt on-disk database
+of them so that the common path does not need to import cctbx.
+
+The database is built once with `regroup.build_sgdb` and is read from
+`$REGROUP_SGDB` if set, or from `regroup/data/subgroups.sgdb` otherwise.
+"""
+
+import argparse
+import functools
+import json
+import os
+import struct
+import numpy as np
+from regroup.profiling import count, stage
+
+SGDB_MAGIC = b"RGSGDB\0\0"
+SGDB_VERSION = 1
+# magic, version, reserved, length of the JSON index
+_SGDB_PREAMBLE = struct.Struct("<8sIIQ")
+_SGDB_ALIGN = 16
+
+
+def _extract_basis_change_op(symbol_and_number):
+    """
+    Extract the regroup/cctbx basis-change operator embedded in cctbx's
+    symbol_and_number() display. If no operator is present, use identity.
+    """
+    s = str(symbol_and_number)
+    if " (No." in s:
+        s = s.split(" (No.", 1)[0]
+    if "(" in s and ")" in s:
+        return s.rsplit("(", 1)[1].split(")", 1)[0].strip()
+    return "x,y,z"
+
+
+class SubgroupTable():
+    """
+    Subgroups of a parent space group in the parent setting.
+
+    All subgroup rotation matrices are stacked into a single (M, 3, 3)
+    array, with `offsets` marking where each subgroup's block starts, so
+    that any number of vectors can be tested against every subgroup in
+    one batched comparison.
+    """
+
+    #-------------------------------------------------------------------#
+    # Constructor
+
+    def __init__(self, rotations, n_smx, symbols, cb_ops, groups=None):
+        self._rotations = np.asarray(rotations, dtype=float).reshape(-1, 3, 3)
+        self._n_smx = np.asarray(n_smx, dtype=int)
+        self._symbols = list(symbols)
+        self._cb_ops = list(cb_ops)
+        self._groups = groups
+
+        if self._n_smx.sum() != len(self._rotations):
+            raise ValueError("Number of rotations does not match subgroup sizes")
+
+        self._offsets = np.concatenate([[0], np.cumsum(self._n_smx)[:-1]])
+
+        # rank subgroups the way get_spacegroup always has: by number of
+        # symops, with ties broken by the symbol string.
+        order = sorted(range(len(self)), key=lambda i: (self._n_smx[i], self._symbols[i]))
+        self._rank = np.empty(len(self), dtype=int)
+        self._rank[order] = np.arange(len(self))
+
+    @classmethod
+    def from_cctbx(cls, parent_sg):
+        """
+        Enumerate the subgroups of `parent_sg` with cctbx.sgtbx.subgroups.
+        """
+        from cctbx import sgtbx
+        from cctbx.sgtbx import subgroups
+
+        parent = sgtbx.space_group_info(parent_sg)
+        subgrs = subgroups.subgroups(parent).groups_parent_setting()
+
+        rotations = []
+        n_smx = []
+        symbols = []
+        cb_ops = []
+        groups = []
+        for subgroup in subgrs:
+            subgroup_info = sgtbx.space_group_info(group=subgroup)
+            for op in subgroup.smx():
+                rotations.append(np.array(op.r().as_double()).reshape((3, 3)))
+            sg_symbol = subgroup_info.symbol_and_number()
+            n_smx.append(subgroup.n_smx())
+            symbols.append(sg_symbol)
+            cb_ops.append(_extract_basis_change_op(sg_symbol))
+            groups.append(subgroup)
+
+        return cls(rotations, n_smx, symbols, cb_ops, groups=groups)
+
+    #-------------------------------------------------------------------#
+    # Attributes
+
+    def __len__(self):
+        return len(self._n_smx)
+
+    @property
+    def rotations(self):
+        return self._rotations
+
+    @property
+    def offsets(self):
+        return self._offsets
+
+    @property
+    def n_smx(self):
+        return self._n_smx
+
+    @property
+    def symbols(self):
+        return self._symbols
+
+    @property
+    def cb_ops(self):
+        return self._cb_ops
+
+    @property
+    def groups(self):
+        return self._groups
+
+    #-------------------------------------------------------------------#
+    # Symmetry Methods
+
+    def valid_subgroups(self, vectors):
+        """
+        Test which subgroups preserve each vector under all of their symops.
+
+        Parameters
+        ----------
+        vectors : array_like, shape (F, 3)
+            Fractional-coordinate vectors, e.g. from
+            `facet_normals_to_crystal_frame`.
+
+        Returns
+        -------
+        np.ndarray, shape (F, S)
+            True where every rotation of subgroup S maps the vector onto
+            itself (to within `np.allclose` tolerances).
+        """
+        v = np.asarray(vectors, dtype=float).reshape(-1, 3)
+        count("subgroups_tested", len(v) * len(self))
+        count("symops_checked", len(v) * len(self.rotations))
+        rotated = np.einsum("mij,fj->fmi", self.rotations, v)
+        preserved = np.isclose(rotated, v[:, None, :]).all(axis=-1)
+        return np.logical_and.reduceat(preserved, self.offsets, axis=1)
+
+    def best_subgroups(self, vectors):
+        """
+        Get the index of the largest subgroup preserving each vector.
+        """
+        valid = self.valid_subgroups(vectors)
+        return self._pick_best(valid)
+
+    def _pick_best(self, valid):
+        return np.where(valid, self._rank, -1).argmax(axis=1)
+
+    #-------------------------------------------------------------------#
+    # Orbit Methods
+    #
+    # A parent rotation R maps facet h to h R^-1 and its fractional normal
+    # n to R n. Subgroup S preserves R n exactly when R^-1 S R preserves n,
+    # so the valid subgroups of every facet in an orbit follow from those
+    # of one representative by conjugating subgroup rotation sets. This
+    # holds only if the parent rotations preserve the metric of the cell,
+    # which a refined cell need not do exactly.
+
+    @functools.cached_property
+    def parent_rotations(self):
+        """
+        Integer rotation matrices of the parent group, (P, 3, 3).
+        """
+        i = int(np.argmax(self.n_smx))
+        start = self.offsets[i]
+        return np.rint(self.rotations[start:start + self.n_smx[i]]).astype(int)
+
+    @functools.cached_property
+    def _rotation_classes(self):
+        """
+        Group subgroups by their set of rotations, which is all that
+        subgroup validity depends on.
+
+        Returns the class of each subgroup, (S,), and for each parent
+        rotation R the class of R^-1 S R for every subgroup S, (P, S),
+        or -1 if that rotation set is not in the table.
+        """
+        rotations = np.rint(self.rotations).astype(int)
+
+        def _keys(rots):
+            return [
+                frozenset(map(bytes, rots[start:start + n].reshape(n, 9).astype(np.int8)))
+                for start, n in zip(self.offsets, self.n_smx)
+            ]
+
+        class_ids = {}
+        classes = np.array([class_ids.setdefault(k, len(class_ids)) for k in _keys(rotations)])
+
+        conjugates = np.empty((len(self.parent_rotations), len(self)), dtype=int)
+        for p, R in enumerate(self.parent_rotations):
+            Rinv = np.rint(np.linalg.inv(R)).astype(int)
+            conj = _keys(Rinv @ rotations @ R)
+            conjugates[p] = [class_ids.get(k, -1) for k in conj]
+        return classes, conjugates
+
+    def facet_orbits(self, hkls):
+        """
+        Group facets into orbits under the parent point group.
+
+        Parameters
+        ----------
+        hkls : array_like, shape (F, 3)
+            Integer Miller indices.
+
+        Returns
+        -------
+        representatives : np.ndarray, shape (K, 3)
+            One facet per orbit.
+        orbit : np.ndarray, shape (F,)
+            Index of the orbit representative of each facet.
+        op : np.ndarray, shape (F,)
+            Index into `parent_rotations` of the rotation R with
+            hkl @ R == representative.
+        """
+        hkls = np.asarray(hkls, dtype=int).reshape(-1, 3)
+        images = np.einsum("fi,pij->pfj", hkls, self.parent_rotations)
+
+        # canonical representative: the image with the largest integer key
+        m = int(np.abs(images).max()) if images.size else 0
+        base = 2 * m + 1
+        keys = ((images[..., 0] + m) * base + images[..., 1] + m) * base + images[..., 2] + m
+        op = keys.argmax(axis=0)
+        rep_keys = keys[op, np.arange(len(hkls))]
+
+        _, first, orbit = np.unique(rep_keys, return_index=True, return_inverse=True)
+        representatives = images[op[first], first]
+        return representatives, orbit.reshape(-1), op
+
+    def preserves_metric(self, O, rtol=1e-8):
+        """
+        Whether every parent rotation R preserves the metric G = O^T O,
+        R^T G R == G to within `rtol` of the largest element of G.
+        """
+        G = O.T @ O
+        R = self.parent_rotations
+        RtGR = np.einsum("pji,jk,pkl->pil", R, G, R)
+        return np.allclose(RtGR, G, rtol=0, atol=rtol * np.abs(G).max())
+
+    def best_subgroups_for_facets(self, hkls, O):
+        """
+        Get the index of the largest subgroup preserving the normal of
+        each facet, evaluating subgroup validity once per orbit. If the
+        parent rotations do not preserve the metric of `O`, every facet
+        is tested directly with `best_subgroups`.
+
+        Parameters
+        ----------
+        hkls : array_like, shape (F, 3)
+            Integer Miller indices.
+        O : np.ndarray, shape (3, 3)
+            Orthogonalization matrix.
+        """
+        from regroup.geom_utils import facet_normals_to_crystal_frame
+
+        hkls = np.asarray(hkls, dtype=int).reshape(-1, 3)
+        if not self.preserves_metric(O):
+            return self.best_subgroups(facet_normals_to_crystal_frame(hkls, O))
+
+        classes, conjugates = self._rotation_classes
+        representatives, orbit, op = self.facet_orbits(hkls)
+
+        valid_rep = self.valid_subgroups(facet_normals_to_crystal_frame(representatives, O))
+
+        # validity of each rotation class for each representative
+        n_classes = classes.max() + 1
+        valid_class = np.zeros((len(representatives), n_classes), dtype=bool)
+        valid_class[:, classes] = valid_rep
+
+        conj = conjugates[op]
+        valid = valid_class[orbit[:, None], np.maximum(conj, 0)]
+        best = self._pick_best(valid)
+
+        # conjugates missing from the table: evaluate those facets directly
+        missing = (conj < 0).any(axis=1)
+        if missing.any():
+            best[missing] = self.best_subgroups(facet_normals_to_crystal_frame(hkls[missing], O))
+        return best
+
+
+#-----------------------------------------------------------------------#
+# On-disk subgroup database
+#
+# Layout (all integers little-endian):
+#   preamble   magic (8 bytes), version (uint32), reserved (uint32),
+#              index length in bytes (uint64)
+#   index      UTF-8 JSON; for each parent space group number, the first
+#              rotation in the data block and the n_smx, symbol and cb_op
+#              of each subgroup
+#   padding    up to a multiple of 16 bytes
+#   data       int8 rotation matrices, (M, 3, 3), for all parents
+
+def default_sgdb_path():
+    """
+    Get the path of the subgroup database.
+    """
+    path = os.environ.get("REGROUP_SGDB")
+    if path:
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "subgroups.sgdb")
+
+
+def write_sgdb(path, numbers=range(1, 231), verbose=False):
+    """
+    Enumerate the subgroups of every parent space group with cctbx and
+    write them to a subgroup database at `path`.
+    """
+    index = {"version": SGDB_VERSION, "parents": {}}
+    blocks = []
+    n_rot = 0
+    for number in numbers:
+        table = SubgroupTable.from_cctbx(int(number))
+        index["parents"][str(number)] = {
+            "start": n_rot,
+            "n_smx": table.n_smx.tolist(),
+            "symbols": table.symbols,
+            "cb_ops": table.cb_ops,
+        }
+        rotations = np.rint(table.rotations)
+        if not np.allclose(rotations, table.rotations):
+            raise ValueError(f"Non-integer rotation in subgroups of space group {number}")
+        blocks.append(rotations.astype(np.int8))
+        n_rot += len(rotations)
+        if verbose:
+            print(f"Space group {number}: {len(table)} subgroups")
+
+    index = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    header = _SGDB_PREAMBLE.pack(SGDB_MAGIC, SGDB_VERSION, 0, len(index)) + index
+    header += b"\0" * (-len(header) % _SGDB_ALIGN)
+
+    dirname = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dirname, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as out:
+        out.write(header)
+        for block in blocks:
+            out.write(block.tobytes())
+    os.replace(tmp, path)
+    return
+
+
+class SubgroupDatabase():
+    """
+    Read-only, memory-mapped view of a subgroup database file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            preamble = f.read(_SGDB_PREAMBLE.size)
+            if len(preamble) != _SGDB_PREAMBLE.size:
+                raise ValueError(f"{path} is not a regroup subgroup database")
+            magic, version, _, index_len = _SGDB_PREAMBLE.unpack(preamble)
+            if magic != SGDB_MAGIC:
+                raise ValueError(f"{path} is not a regroup subgroup database")
+            if version != SGDB_VERSION:
+                raise ValueError(
+                    f"{path} has database version {version}, expected {SGDB_VERSION}. "
+                    "Please rebuild it with regroup.build_sgdb"
+                )
+            index = json.loads(f.read(index_len).decode("utf-8"))
+
+        offset = _SGDB_PREAMBLE.size + index_len
+        offset += -offset % _SGDB_ALIGN
+        n_rot = sum(sum(p["n_smx"]) for p in index["parents"].values())
+
+        self._path = path
+        self._parents = index["parents"]
+        self._rotations = np.memmap(path, dtype=np.int8, mode="r", offset=offset, shape=(n_rot, 3, 3))
+
+    @property
+    def path(self):
+        return self._path
+
+    def __contains__(self, number):
+        return str(number) in self._parents
+
+    def get_table(self, number):
+        """
+        Get the SubgroupTable of parent space group `number`.
+        """
+        entry = self._parents[str(number)]
+        start = entry["start"]
+        stop = start + sum(entry["n_smx"])
+        return SubgroupTable(
+            self._rotations[start:stop],
+            entry["n_smx"],
+            entry["symbols"],
+            entry["cb_ops"],
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _open_sgdb(path):
+    return SubgroupDatabase(path)
+
+
+def _space_group_number(parent_sg):
+    """
+    Return `parent_sg` as a space group number, or None if it is a symbol.
+    """
+    if isinstance(parent_sg, (int, np.integer)):
+        return int(parent_sg)
+    if isinstance(parent_sg, str) and parent_sg.strip().isdigit():
+        return int(parent_sg)
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_subgroup_table(parent_sg):
+    """
+    Get the (cached) SubgroupTable of a parent space group.
+
+    Space group numbers are looked up in the subgroup database when it
+    exists. Symbols, and any lookup without a database, go through cctbx.
+    """
+    with stage("subgroup_table"):
+        number = _space_group_number(parent_sg)
+        path = default_sgdb_path()
+        if number is not None and os.path.exists(path):
+            sgdb = _open_sgdb(path)
+            if number in sgdb:
+                return sgdb.get_table(number)
+        return SubgroupTable.from_cctbx(parent_sg)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawTextHelpFormatter,
+        description="Build the regroup subgroup database for all 230 space groups.",
+    )
+    parser.add_argument(
+        "-o", "--out",
+        default=None,
+        help=f"Output database filename. Default: {default_sgdb_path()}",
+    )
+    parser.add_argument(
+        "-q", "--quiet",
+        action="store_true",
+        help="Suppress per-space-group output",
+    )
+    args = parser.parse_args()
+
+    out = args.out or default_sgdb_path()
+    write_sgdb(out, verbose=not args.quiet)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
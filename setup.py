@@ -6,6 +6,7 @@ setup(
     author='Harrison K. Wang, Jack B. Greisman',
     author_email='hwang1@g.harvard.edu',
     packages=find_packages(),
+    package_data={"regroup": ["data/*.sgdb"]},
     description='Space group conversion upon directional perturbation',
     install_requires=[
         "pandas",
@@ -13,10 +14,15 @@ setup(
         "reciprocalspaceship",
         "gemmi",
     ],
+    extras_require={
+        "index": ["scipy"],
+    },
     entry_points={
         'console_scripts': [
             'regroup=regroup.regroup:main',
-            'regroup.low_sym=regroup.low_sym:main'
+            'regroup.low_sym=regroup.low_sym:main',
+            'regroup.pipeline=regroup.pipeline:main',
+            'regroup.build_sgdb=regroup.subgrouptable:main'
         ]
     }
 )
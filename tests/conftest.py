@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# synthetic geometry writers shared with the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+from synthetic import CRYSTALS, write_inp_set  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def inp_set(tmp_path_factory):
+    """
+    Synthetic .inp files of a tetragonal crystal, and its space group.
+    """
+    cell, spacegroup = CRYSTALS["tetragonal"]
+    paths = write_inp_set(str(tmp_path_factory.mktemp("inp")), 25, cell, spacegroup)
+    return paths, spacegroup
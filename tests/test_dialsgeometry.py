@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from regroup.dialsgeometry import ExptList, UnsupportedExptFile, read_expt_stills
+from regroup.framegeometry import get_orthogonalization_matrix
+from synthetic import CRYSTALS, write_stills_expt
+
+CELL, _ = CRYSTALS["monoclinic"]
+
+
+@pytest.fixture
+def expt(tmp_path):
+    path = str(tmp_path / "stills.expt")
+    Astars = write_stills_expt(path, 12, CELL)
+    return path, Astars
+
+
+def _rewrite(path, edit, **kwargs):
+    with open(path) as f:
+        data = json.load(f)
+    edit(data)
+    with open(path, "w") as f:
+        json.dump(data, f, **kwargs)
+    return path
+
+
+# a small block size makes names, numbers, and whole experiments span reads
+@pytest.mark.parametrize("block_size", [7, 1 << 20])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_read_expt_stills(expt, block_size, indent):
+    path, Astars = expt
+    if indent is not None:
+        _rewrite(path, lambda data: None, indent=indent)
+    result = read_expt_stills(path, block_size=block_size)
+
+    np.testing.assert_allclose(result["Astars"], Astars, rtol=1e-12)
+    dirname = os.path.dirname(path)
+    assert result["images"] == [os.path.join(dirname, f"frame_{i:06d}.cbf") for i in range(12)]
+    np.testing.assert_allclose(result["cell"], CELL, rtol=1e-9)
+
+
+def test_exptlist_without_dxtbx(expt):
+    path, Astars = expt
+    expts = ExptList(path)
+
+    np.testing.assert_allclose(expts.get_reciprocal_Amatrices(), Astars, rtol=1e-12)
+    assert len(expts.get_image_filenames()) == len(Astars)
+    np.testing.assert_allclose(expts.get_orthogonalization_matrix(), get_orthogonalization_matrix(*CELL), rtol=1e-9)
+
+
+def _shared_imagesets(data):
+    for experiment in data["experiment"]:
+        experiment["imageset"] = 0
+
+
+def _scans(data):
+    data["scan"] = [{"__id__": "Scan", "image_range": [1, 12]}]
+    for experiment in data["experiment"]:
+        experiment["scan"] = 0
+
+
+@pytest.mark.parametrize("edit", [_shared_imagesets, _scans], ids=["shared_imagesets", "scans"])
+def test_unsupported_layout(expt, edit):
+    path = _rewrite(expt[0], edit)
+    with pytest.raises(UnsupportedExptFile):
+        read_expt_stills(path, block_size=7)
+
+
+@pytest.mark.parametrize("text", [b"not json", b'{"__id__": "ExperimentList", ', b"\xff\xfe\x00", b"[1, 2]"])
+def test_not_json(tmp_path, text):
+    path = tmp_path / "bad.expt"
+    path.write_bytes(text)
+    with pytest.raises(UnsupportedExptFile):
+        read_expt_stills(str(path), block_size=7)
+
+
+def test_exptlist_falls_back_to_dxtbx(expt, monkeypatch):
+    path = _rewrite(expt[0], _scans)
+    calls = []
+    monkeypatch.setattr(ExptList, "readExptFile", lambda self, exptfile: calls.append(exptfile))
+
+    ExptList(path)
+    assert calls == [path]
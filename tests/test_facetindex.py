@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from regroup.facetindex import FacetIndex  # noqa: E402
+from regroup.framegeometry import get_orthogonalization_matrix  # noqa: E402
+from regroup.geom_utils import generate_facets  # noqa: E402
+
+CELL = (81.2, 44.6, 52.3, 90.0, 110.8, 90.0)
+
+
+@pytest.mark.parametrize("max_angle", [5.0, 30.0, 90.0, 180.0])
+def test_query_radius_matches_brute_force(max_angle):
+    O = get_orthogonalization_matrix(*CELL).T
+    index = FacetIndex(generate_facets(3), O)
+    ef_cryst = np.random.default_rng(0).normal(size=(20, 3))
+
+    frames, facet_idx, angles = index.query_radius(ef_cryst, max_angle)
+
+    v = index.to_cartesian(ef_cryst)
+    expected = np.degrees(np.arccos(np.clip(v @ index.normals.T, -1.0, 1.0)))
+    hits = set(zip(*np.nonzero(expected <= max_angle)))
+    assert set(zip(frames.tolist(), facet_idx.tolist())) == hits
+    np.testing.assert_allclose(angles, expected[frames, facet_idx], atol=1e-10)
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from regroup.framegeometry import FrameGeometry, get_reciprocal_Amatrices, read_inp_batch, read_inp_files
+from synthetic import CRYSTALS, write_inp_set
+
+CELL, SPACEGROUP = CRYSTALS["triclinic"]
+
+
+@pytest.fixture(scope="module")
+def inp_files(tmp_path_factory):
+    return write_inp_set(str(tmp_path_factory.mktemp("inp")), 13, CELL, SPACEGROUP)
+
+
+def _without_goniometer(path, out):
+    with open(path) as f:
+        lines = [line for line in f if not line.split()[:1] == ["Goniometer"]]
+    with open(out, "w") as f:
+        f.writelines(lines)
+    return str(out)
+
+
+def test_read_inp_batch_matches_frame_geometry(inp_files):
+    records = read_inp_batch(inp_files)
+    assert len(records) == len(inp_files)
+    for record, path in zip(records, inp_files):
+        geometry = FrameGeometry(path)
+        np.testing.assert_array_equal(record["crystal"], np.asarray(geometry.crystal, dtype=float))
+        assert record["spacegroup"] == int(geometry.spacegroup)
+        np.testing.assert_array_equal(record["matrix"], np.asarray(geometry.matrix, dtype=float))
+        np.testing.assert_array_equal(record["omega"], np.asarray(geometry.omega, dtype=float))
+        np.testing.assert_array_equal(record["goniometer"], np.asarray(geometry.goniometer, dtype=float))
+
+
+def test_from_record_matches_frame_geometry(inp_files):
+    for record, path in zip(read_inp_batch(inp_files), inp_files):
+        geometry = FrameGeometry(path)
+        lightweight = FrameGeometry.from_record(record, path)
+        assert lightweight.image == path
+        np.testing.assert_array_equal(lightweight.get_reciprocal_Amatrix(), geometry.get_reciprocal_Amatrix())
+        np.testing.assert_array_equal(
+            lightweight.get_orthogonalization_matrix(), geometry.get_orthogonalization_matrix()
+        )
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_read_inp_batch_keeps_order_with_workers(inp_files, executor):
+    expected = read_inp_batch(inp_files)
+    np.testing.assert_array_equal(read_inp_batch(inp_files, jobs=3, executor=executor), expected)
+
+
+def test_read_inp_batch_without_goniometer(inp_files, tmp_path):
+    path = _without_goniometer(inp_files[0], tmp_path / "frame.mccd.inp")
+    record = read_inp_batch([path])[0]
+    assert np.isnan(record["goniometer"]).all()
+    assert FrameGeometry.from_record(record, path).goniometer is None
+
+
+def test_read_inp_batch_errors(inp_files, tmp_path):
+    with pytest.raises(ValueError, match="Cannot find file"):
+        read_inp_batch([str(tmp_path / "missing.inp")])
+    with pytest.raises(ValueError, match="Unknown executor"):
+        read_inp_batch(inp_files, jobs=2, executor="fiber")
+
+
+def test_get_reciprocal_Amatrices_matches_frame_geometry(inp_files):
+    records = read_inp_batch(inp_files)
+    Astars = get_reciprocal_Amatrices(
+        records["crystal"], records["matrix"], records["omega"], records["goniometer"][:, 2],
+    )
+    expected = np.stack([FrameGeometry(path).get_reciprocal_Amatrix() for path in inp_files])
+    np.testing.assert_array_equal(Astars, expected)
+
+
+def test_get_reciprocal_Amatrices_per_frame_cells(inp_files, tmp_path):
+    # a second cell for every other frame
+    paths = []
+    for i, path in enumerate(inp_files):
+        geometry = FrameGeometry(path)
+        if i % 2:
+            geometry.crystal = [c * 1.01 for c in CELL[:3]] + list(CELL[3:])
+        out = str(tmp_path / f"frame_{i:06d}.mccd.inp")
+        geometry.writeINPFile(out)
+        paths.append(out)
+
+    records = read_inp_batch(paths)
+    assert len(np.unique(records["crystal"], axis=0)) == 2
+    Astars = get_reciprocal_Amatrices(
+        records["crystal"], records["matrix"], records["omega"], records["goniometer"][:, 2],
+    )
+    expected = np.stack([FrameGeometry(path).get_reciprocal_Amatrix() for path in paths])
+    np.testing.assert_array_equal(Astars, expected)
+
+
+def test_get_reciprocal_Amatrices_requires_goniometer(inp_files, tmp_path):
+    paths = [inp_files[0], _without_goniometer(inp_files[1], tmp_path / "frame.mccd.inp")]
+    records = read_inp_batch(paths)
+    with pytest.raises(ValueError, match="Goniometer settings are required"):
+        get_reciprocal_Amatrices(
+            records["crystal"], records["matrix"], records["omega"], records["goniometer"][:, 2],
+        )
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_read_inp_files_keeps_order_with_workers(inp_files, executor):
+    Astars, images, O = read_inp_files(inp_files, jobs=3, executor=executor)
+    expected = np.stack([FrameGeometry(path).get_reciprocal_Amatrix() for path in inp_files])
+    np.testing.assert_array_equal(Astars, expected)
+    assert images == inp_files
+    np.testing.assert_array_equal(O, FrameGeometry(inp_files[0]).get_orthogonalization_matrix())
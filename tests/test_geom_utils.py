@@ -0,0 +1,63 @@
+import itertools
+from math import gcd
+
+import numpy as np
+import pytest
+
+from regroup.framegeometry import get_orthogonalization_matrix
+from regroup.geom_utils import d_spacings, generate_facets
+from synthetic import CRYSTALS
+
+
+def _primitive_planes(hmax):
+    return [
+        hkl for hkl in itertools.product(range(-hmax, hmax + 1), repeat=3)
+        if gcd(gcd(hkl[0], hkl[1]), hkl[2]) == 1
+    ]
+
+
+@pytest.mark.parametrize("hmax", [1, 2, 3, 5])
+def test_generate_facets_matches_product(hmax):
+    facets = generate_facets(hmax)
+    assert facets.dtype.kind == "i"
+    assert [tuple(hkl) for hkl in facets.tolist()] == _primitive_planes(hmax)
+
+
+@pytest.mark.parametrize("crystal", CRYSTALS)
+@pytest.mark.parametrize("dmin, dmax", [(10.0, None), (None, 20.0), (8.0, 25.0)])
+def test_generate_facets_d_spacing(crystal, dmin, dmax):
+    O = get_orthogonalization_matrix(*CRYSTALS[crystal][0]).T
+    hmax = 4
+    if dmin is not None:
+        # every plane with d >= dmin, from an unbounded grid
+        hmax = int(np.ceil(np.linalg.norm(O, axis=0).max() / dmin)) + 1
+
+    hkls = np.array(_primitive_planes(hmax))
+    d = d_spacings(hkls, O)
+    keep = np.ones(len(hkls), dtype=bool)
+    if dmin is not None:
+        keep &= d >= dmin
+    if dmax is not None:
+        keep &= d <= dmax
+    expected = {tuple(hkl) for hkl in hkls[keep].tolist()}
+
+    facets = generate_facets(None if dmin is not None else hmax, O=O, dmin=dmin, dmax=dmax)
+    assert {tuple(hkl) for hkl in facets.tolist()} == expected
+    assert len(facets) == len(expected)
+
+
+def test_dmin_bound_keeps_planes_at_dmin():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        cell = (*rng.uniform(20.0, 120.0, size=3), 90.0, 90.0, 90.0)
+        O = get_orthogonalization_matrix(*cell).T
+        for axis in np.eye(3, dtype=int):
+            dmin = d_spacings(axis[None, :], O)[0]
+            assert axis.tolist() in generate_facets(O=O, dmin=dmin).tolist()
+
+
+def test_generate_facets_errors():
+    with pytest.raises(ValueError, match="O is required"):
+        generate_facets(2, dmin=5.0)
+    with pytest.raises(ValueError, match="hmax, dmin, or both"):
+        generate_facets()
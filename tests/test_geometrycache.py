@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pytest
+
+from regroup.geometrycache import GeometryCache
+from regroup.profiling import Profile, profiling
+from regroup.regroup import load_geometry
+
+
+def _geometry(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, 3, 3)), [f"image_{i:03d}.mccd" for i in range(n)], rng.normal(size=(3, 3))
+
+
+def _write(path, text="frame\n"):
+    with open(path, "w") as f:
+        f.write(text)
+    return str(path)
+
+
+def test_load_geometry_hits_cache(inp_set, tmp_path):
+    paths, _ = inp_set
+    cache = GeometryCache(str(tmp_path / "cache"))
+    parsed = load_geometry(paths, cache=cache)
+
+    profile = Profile()
+    with profiling(profile):
+        cached = load_geometry(paths, cache=cache)
+    assert profile.to_dict()["counters"] == {"geometry_cache_hits": 1}
+
+    np.testing.assert_array_equal(cached[0], parsed[0])
+    assert cached[1] == list(parsed[1])
+    np.testing.assert_array_equal(cached[2], parsed[2])
+
+
+@pytest.mark.parametrize("change", ["mtime", "size"])
+def test_entry_invalidated_by_file_change(tmp_path, change):
+    path = _write(tmp_path / "frame.inp")
+    cache = GeometryCache(str(tmp_path / "cache"))
+    cache.put([path], *_geometry(2))
+    assert cache.get([path]) is not None
+
+    if change == "mtime":
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    else:
+        _write(path, "frame, edited\n")
+    assert cache.get([path]) is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache_dir = tmp_path / "cache"
+    paths = [_write(tmp_path / f"frame_{i}.inp") for i in range(3)]
+
+    cache = GeometryCache(str(cache_dir))
+    cache.put([paths[0]], *_geometry(100))
+    size = sum(entry.stat().st_size for entry in cache_dir.iterdir())
+
+    # room for two entries
+    cache = GeometryCache(str(cache_dir), max_bytes=2 * size)
+    cache.put([paths[1]], *_geometry(100))
+    for i, path in enumerate(paths[:2]):
+        entry = cache_dir / f"{cache.key([path])}.npz"
+        os.utime(entry, ns=(i * 10**9, i * 10**9))
+    # reading the older entry makes the newer one least recently used
+    assert cache.get([paths[0]]) is not None
+    cache.put([paths[2]], *_geometry(100))
+
+    assert cache.get([paths[0]]) is not None
+    assert cache.get([paths[1]]) is None
+    assert cache.get([paths[2]]) is not None
+
+
+def test_unwritable_cache_warns(tmp_path):
+    path = _write(tmp_path / "frame.inp")
+    blocker = _write(tmp_path / "not_a_directory")
+    cache = GeometryCache(os.path.join(blocker, "cache"))
+
+    with pytest.warns(UserWarning, match="continuing uncached"):
+        cache.put([path], *_geometry(2))
+    assert cache.get([path]) is None
+
+
+def test_load_geometry_without_writable_cache(inp_set, tmp_path):
+    paths, _ = inp_set
+    blocker = _write(tmp_path / "not_a_directory")
+
+    with pytest.warns(UserWarning, match="continuing uncached"):
+        Astars, images, O = load_geometry(paths, cache=GeometryCache(os.path.join(blocker, "cache")))
+    assert len(Astars) == len(images) == len(paths)
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+gemmi = pytest.importorskip("gemmi")
+rs = pytest.importorskip("reciprocalspaceship")
+
+from regroup.low_sym import (  # noqa: E402
+    ReindexPlan,
+    _consistent_cells,
+    _has_duplicate_hkls,
+    _mtz_data,
+    _reindex_hkls,
+    cctbx_cb_op_to_rs_op,
+    mtz_regroup_basis_change,
+    stream_regroup_basis_change,
+)
+
+CELL = (79.1, 79.1, 38.2, 90.0, 90.0, 90.0)
+SPACEGROUP = 96
+OP, LOWSYM = "a-1/4,b,c-3/8", "P 1 21 1"
+
+
+def _dataset(hkls, seed=0):
+    rng = np.random.default_rng(seed)
+    return rs.DataSet(
+        {
+            "H": hkls[:, 0],
+            "K": hkls[:, 1],
+            "L": hkls[:, 2],
+            "I": rng.gamma(2.0, size=len(hkls)),
+            "SIGI": rng.gamma(1.0, size=len(hkls)),
+        },
+        cell=gemmi.UnitCell(*CELL),
+        spacegroup=gemmi.SpaceGroup(SPACEGROUP),
+    ).infer_mtz_dtypes().set_index(["H", "K", "L"])
+
+
+def _write_mtz(path, kind):
+    cell, sg = gemmi.UnitCell(*CELL), gemmi.SpaceGroup(SPACEGROUP)
+    if kind == "merged":
+        ds = _dataset(rs.utils.generate_reciprocal_asu(cell, sg, 3.0, anomalous=True))
+        ds.merged = True
+    elif kind in ("unmerged", "unmerged_spread"):
+        hkls = rs.utils.generate_reciprocal_asu(cell, sg, 3.0, anomalous=True)
+        # repeats next to each other, or a whole ASU apart
+        ds = _dataset(np.repeat(hkls, 3, axis=0) if kind == "unmerged" else np.tile(hkls, (3, 1)))
+        ds.merged = False
+    else:
+        # an M/ISYM column without repeated HKLs, which rs reads as merged
+        ds = _dataset(rs.utils.generate_reciprocal_asu(cell, sg, 3.0, anomalous=False))
+        ds.hkl_to_asu(inplace=True)
+    ds.write_mtz(str(path))
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [100, 1_000_000])
+@pytest.mark.parametrize("kind", ["merged", "unmerged", "merged_m_isym"])
+def test_stream_matches_write_mtz(tmp_path, kind, chunk_size):
+    mtz = _write_mtz(tmp_path / f"{kind}.mtz", kind)
+    assert rs.read_mtz(mtz).merged == (kind != "unmerged")
+    expected = tmp_path / "expected.mtz"
+    mtz_regroup_basis_change(mtz, OP, LOWSYM, verbose=False).write_mtz(str(expected))
+
+    out = stream_regroup_basis_change(
+        mtz, str(tmp_path / "out.mtz"), OP, LOWSYM, chunk_size=chunk_size, verbose=False,
+    )
+    assert open(out, "rb").read() == expected.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "kind, expected",
+    [("merged", False), ("unmerged", True), ("unmerged_spread", True), ("merged_m_isym", False)],
+)
+def test_has_duplicate_hkls(tmp_path, kind, expected):
+    mtz = _write_mtz(tmp_path / f"{kind}.mtz", kind)
+    header = gemmi.read_mtz_file(mtz, with_data=False)
+    data = _mtz_data(mtz, header)
+
+    for chunk_size in (100, len(data)):
+        assert _has_duplicate_hkls(data, header, chunk_size) == expected
+
+
+def _phased_dataset(spacegroup, cell, seed=0):
+    cell, sg = gemmi.UnitCell(*cell), gemmi.SpaceGroup(spacegroup)
+    hkls = rs.utils.generate_reciprocal_asu(cell, sg, 3.0, anomalous=True)
+    rng = np.random.default_rng(seed)
+    ds = rs.DataSet(
+        {
+            "H": hkls[:, 0],
+            "K": hkls[:, 1],
+            "L": hkls[:, 2],
+            "F": rng.gamma(2.0, size=len(hkls)),
+            "PHI": rng.uniform(-180.0, 180.0, size=len(hkls)),
+        },
+        cell=cell,
+        spacegroup=sg,
+    ).infer_mtz_dtypes().set_index(["H", "K", "L"])
+    ds["PHI"] = ds["PHI"].astype("Phase")
+    ds["FC"] = ds["F"].to_numpy() * np.exp(1j * np.deg2rad(ds["PHI"].to_numpy()))
+    ds.merged = True
+    return ds
+
+
+@pytest.mark.parametrize(
+    "spacegroup, cell, op, lowsym",
+    [
+        # with a translation
+        (96, CELL, "a-1/4,b,c-3/8", "P 1 21 1"),
+        # centred to primitive
+        (20, (80.0, 60.0, 40.0, 90.0, 90.0, 90.0), "a+b,a-b,-c", "P 1"),
+        # inverting, which conjugates complex values
+        (1, (30.0, 40.0, 50.0, 80.0, 85.0, 95.0), "-a,-b,-c", "P 1"),
+    ],
+)
+def test_matches_apply_symop(spacegroup, cell, op, lowsym):
+    ds = _phased_dataset(spacegroup, cell)
+    result = mtz_regroup_basis_change(ds, op, lowsym, verbose=False, chunk_size=1000)
+
+    # the reindexing of earlier versions, with rs.DataSet.apply_symop
+    op1 = cctbx_cb_op_to_rs_op(op)
+    expected = ds.copy()
+    for label, column in zip(["Hh", "Kh", "Lh"], expected.get_hkls().T):
+        expected[label] = column
+        expected[label] = expected[label].astype("MTZInt")
+    expected.cell = expected.cell.changed_basis_forward(op1.inverse(), True)
+    expected.spacegroup = gemmi.SpaceGroup(lowsym)
+    expected = expected.apply_symop(op1)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.cell.parameters == expected.cell.parameters
+    assert result.spacegroup.hm == expected.spacegroup.hm
+
+
+def test_fractional_hkls_error():
+    H = np.array(
+        [[2, 0, 0], [1, 0, 0], [3, 1, 1], [4, 2, 2], [5, 0, 1], [7, 1, 0], [9, 0, 0], [11, 0, 0]],
+        dtype=np.int32,
+    )
+    op = gemmi.Op("x/2,y,z")
+    rot = np.array(op.rot, dtype=np.int64)
+
+    with pytest.raises(RuntimeError) as info:
+        _reindex_hkls(H, rot, op.DEN, chunk_size=2)
+    message = str(info.value)
+    assert "6 of 8 HKLs become fractional" in message
+    # the first five, across blocks
+    assert message.endswith(
+        "e.g. (1, 0, 0) -> (0.5, 0, 0); (3, 1, 1) -> (1.5, 1, 1); (5, 0, 1) -> (2.5, 0, 1); "
+        "(7, 1, 0) -> (3.5, 1, 0); (9, 0, 0) -> (4.5, 0, 0)"
+    )
+
+    op = gemmi.Op("2*x,y,z")
+    expected = H * [2, 1, 1]
+    np.testing.assert_array_equal(_reindex_hkls(H, np.array(op.rot, dtype=np.int64), op.DEN, chunk_size=3), expected)
+
+
+def test_inconsistent_cells():
+    op = cctbx_cb_op_to_rs_op(OP)
+    rot = np.array(op.rot, dtype=np.int64)
+    cell = gemmi.UnitCell(*CELL)
+    cell_new = cell.changed_basis_forward(op.inverse(), True)
+    assert _consistent_cells(rot, op.DEN, cell, cell_new)
+    assert not _consistent_cells(rot, op.DEN, cell, gemmi.UnitCell(79.1, 79.1, 38.3, 90.0, 90.0, 90.0))
+
+    plan = ReindexPlan(OP, LOWSYM, cell, gemmi.SpaceGroup(SPACEGROUP), verbose=False)
+    # HKLs reindexed by another rotation than the one the new cell is for
+    plan._rot = np.array(cctbx_cb_op_to_rs_op("a+b,b,c").rot, dtype=np.int64)
+    with pytest.raises(RuntimeError, match="do not provide consistent dHKLs"):
+        plan.new_cell(cell)
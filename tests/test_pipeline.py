@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+import pytest
+
+# cctbx before gemmi, which the subgroup search and the conversion need
+pytest.importorskip("cctbx")
+gemmi = pytest.importorskip("gemmi")
+rs = pytest.importorskip("reciprocalspaceship")
+
+from regroup.geom_utils import get_normal_vectors  # noqa: E402
+from regroup.pipeline import run_pipeline  # noqa: E402
+from regroup.regroup import load_geometry  # noqa: E402
+from synthetic import write_inp_set  # noqa: E402
+
+CELL = (59.3, 70.1, 84.6, 90.0, 90.0, 90.0)
+
+
+def _write_mtz(path, spacegroup):
+    cell, sg = gemmi.UnitCell(*CELL), gemmi.SpaceGroup(spacegroup)
+    hkls = rs.utils.generate_reciprocal_asu(cell, sg, 4.0, anomalous=True)
+    ds = rs.DataSet(
+        {"H": hkls[:, 0], "K": hkls[:, 1], "L": hkls[:, 2], "I": np.ones(len(hkls)), "SIGI": np.ones(len(hkls))},
+        cell=cell,
+        spacegroup=sg,
+    ).infer_mtz_dtypes().set_index(["H", "K", "L"])
+    ds.merged = True
+    ds.write_mtz(str(path))
+    return str(path)
+
+
+# subgroups in a non-reference setting that the op x,y,z does not change
+@pytest.mark.parametrize(
+    "parent, expected",
+    [(16, "P 2 1 1"), (21, "C 2 1 1")],
+)
+def test_pipeline_keeps_subgroup_setting(tmp_path, capsys, parent, expected):
+    paths = write_inp_set(str(tmp_path / "inp"), 10, CELL, parent)
+    mtz = _write_mtz(tmp_path / "parent.mtz", parent)
+
+    # field along the (1, 0, 0) facet normal
+    Astars, _, _ = load_geometry(paths)
+    efvector = get_normal_vectors(np.array([[1.0, 0.0, 0.0]]), Astars).reshape(-1, 3).mean(axis=0)
+
+    op, lowsym, sg_num, outcomes = run_pipeline(paths, parent, [mtz], hmax=1, efvector=efvector, verbose=False)
+    assert "Best-match facet: (1, 0, 0)" in capsys.readouterr().out
+    assert (op, lowsym) == ("x,y,z", expected)
+
+    out, status, error = outcomes[0]
+    assert (status, error) == ("written", None)
+    assert gemmi.read_mtz_file(out).spacegroup.hm == expected
+    with open(f"{out}.regroup.json") as f:
+        assert json.load(f)["symbol"] == expected
+
+    _, _, _, outcomes = run_pipeline(paths, parent, [mtz], hmax=1, efvector=efvector, verbose=False)
+    assert outcomes[0][1] == "up to date"
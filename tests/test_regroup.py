@@ -0,0 +1,126 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from regroup.geom_utils import lab_vec_to_crystal_batch
+from regroup.regroup import (
+    analyze_facets,
+    fsa_tables,
+    load_geometry,
+    regroup_columns,
+    report_validation,
+    write_columns,
+)
+
+EFVECTOR = (0.0, 1.0, 0.0)
+
+PATHS = {
+    "default": {},
+    "stream": {"stream": True, "chunk_size": 7},
+    "long_form": {"long_form": True},
+    "top_k": {"top_k": 5, "chunk_size": 7},
+    "max_angle": pytest.param(
+        {"max_angle": 45.0, "chunk_size": 7},
+        marks=pytest.mark.skipif(importlib.util.find_spec("scipy") is None, reason="--max-angle needs scipy"),
+    ),
+}
+
+
+@pytest.mark.parametrize("kwargs", PATHS.values(), ids=PATHS.keys())
+def test_analyze_facets_validates(inp_set, capsys, kwargs):
+    paths, spacegroup = inp_set
+    results, O = analyze_facets(paths, spacegroup, hmax=2, efvector=EFVECTOR, validate=True, **kwargs)
+
+    assert "max angle discrepancy between lab and crystal frames" in capsys.readouterr().out
+    assert len(results) > 0
+    assert np.all(np.diff(results[("Angle", "mean")].to_numpy()) >= 0)
+
+
+@pytest.mark.parametrize("kwargs", [PATHS["stream"], PATHS["long_form"]], ids=["stream", "long_form"])
+def test_matches_default(inp_set, kwargs):
+    paths, spacegroup = inp_set
+    default, _ = analyze_facets(paths, spacegroup, hmax=2, efvector=EFVECTOR)
+    other, _ = analyze_facets(paths, spacegroup, hmax=2, efvector=EFVECTOR, **kwargs)
+
+    assert default["Facet"].tolist() == other["Facet"].tolist()
+    for column in [("Angle", "mean"), ("Angle", "std")]:
+        np.testing.assert_allclose(default[column], other[column], rtol=1e-10)
+    np.testing.assert_array_equal(default[("Angle", "count")], other[("Angle", "count")])
+    assert default[("ef_crystal", "mean_vec")].tolist() == other[("ef_crystal", "mean_vec")].tolist()
+    np.testing.assert_allclose(
+        default[("ef_crystal", "mean")].tolist(), other[("ef_crystal", "mean")].tolist(), rtol=1e-10,
+    )
+    assert default["spacegroup"].tolist() == other["spacegroup"].tolist()
+
+
+def test_top_k_keeps_k_facets(inp_set):
+    paths, spacegroup = inp_set
+    results, _ = analyze_facets(paths, spacegroup, hmax=2, efvector=EFVECTOR, top_k=3)
+    assert len(results) == 3
+
+
+COLUMN_DTYPES = {
+    **dict.fromkeys(["h", "k", "l", "angle_count", "sg_number", "n_symops"], np.int64),
+    **dict.fromkeys(
+        ["angle_mean", "angle_std", "ef_x", "ef_y", "ef_z", "normal_x", "normal_y", "normal_z"], np.float64,
+    ),
+    **dict.fromkeys(["sg_symbol", "cb_op"], np.str_),
+}
+
+
+@pytest.mark.parametrize("kwargs", [PATHS["default"], PATHS["long_form"]], ids=["default", "long_form"])
+def test_regroup_columns(inp_set, kwargs):
+    paths, spacegroup = inp_set
+    columns = regroup_columns(paths, spacegroup, hmax=2, efvector=EFVECTOR, **kwargs)
+
+    assert columns.keys() == COLUMN_DTYPES.keys()
+    n = len(columns["h"])
+    for name, dtype in COLUMN_DTYPES.items():
+        assert columns[name].dtype.type is dtype, name
+        assert columns[name].shape == (n,)
+    assert np.all((columns["sg_number"] >= 1) & (columns["sg_number"] <= spacegroup))
+    assert all(symbol.endswith(f"(No. {number})") for number, symbol in zip(columns["sg_number"], columns["sg_symbol"]))
+
+    # every facet is seen on every frame, and ef_* is not rounded
+    Astars, _, _ = load_geometry(paths)
+    ef = lab_vec_to_crystal_batch(np.array(EFVECTOR), Astars).mean(axis=0)
+    ef_columns = np.stack([columns["ef_x"], columns["ef_y"], columns["ef_z"]], axis=1)
+    np.testing.assert_allclose(ef_columns, np.broadcast_to(ef, (n, 3)), rtol=1e-12, atol=1e-15)
+    assert not np.allclose(ef, np.round(ef, 4), rtol=0, atol=1e-8)
+
+
+def test_write_columns_npz_round_trip(inp_set, tmp_path):
+    paths, spacegroup = inp_set
+    columns = regroup_columns(paths, spacegroup, hmax=2, efvector=EFVECTOR)
+    path = str(tmp_path / "facets.npz")
+    write_columns(columns, path)
+
+    with np.load(path) as loaded:
+        assert sorted(loaded.files) == sorted(columns)
+        for name, column in columns.items():
+            assert loaded[name].dtype == column.dtype, name
+            np.testing.assert_array_equal(loaded[name], column)
+
+    with pytest.raises(ValueError, match="Unrecognized output format"):
+        write_columns(columns, str(tmp_path / "facets.csv"))
+
+
+def test_fsa_tables_uses_analyzed_geometry(inp_set):
+    paths, spacegroup = inp_set
+    results, O, Astars, images = analyze_facets(
+        paths, spacegroup, hmax=2, efvector=EFVECTOR, return_geometry=True,
+    )
+    tables = fsa_tables(spacegroup, results, O, Astars, images, efvector=EFVECTOR)
+
+    n_ops = len(tables["facets"]["opnum"])
+    assert tables["facets"]["fsa"].shape == (n_ops, len(results))
+    assert tables["frames"]["fsa"].shape == (n_ops, len(paths))
+    assert tables["frames"]["images"].tolist() == list(images)
+    assert tables["mean"]["fsa"].shape == (n_ops, 1)
+
+
+def test_report_validation_raises_on_bad_frames(capsys):
+    report_validation(1e-9, np.array([], dtype=int), ["a", "b", "c"])
+    with pytest.raises(RuntimeError, match=r"disagree on 2 frame\(s\): a, c"):
+        report_validation(3.0, np.array([0, 2]), ["a", "b", "c"])
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from regroup.framegeometry import get_orthogonalization_matrix
+from regroup.geom_utils import facet_normals_to_crystal_frame, generate_facets
+from regroup.subgrouptable import SubgroupDatabase, SubgroupTable, write_sgdb
+from synthetic import CRYSTALS
+
+pytest.importorskip("cctbx")
+
+# parent groups with facet orbits of every size, including centred and
+# rhombohedral lattices, in a cell of their crystal system
+PARENTS = {
+    **{sg: cell for cell, sg in CRYSTALS.values()},
+    5: (81.2, 44.6, 52.3, 90.0, 110.8, 90.0),
+    123: (79.1, 79.1, 38.2, 90.0, 90.0, 90.0),
+    166: (103.4, 103.4, 124.9, 90.0, 90.0, 120.0),
+    191: (103.4, 103.4, 124.9, 90.0, 90.0, 120.0),
+    229: (102.6, 102.6, 102.6, 90.0, 90.0, 90.0),
+}
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return {sg: SubgroupTable.from_cctbx(sg) for sg in PARENTS}
+
+
+@pytest.mark.parametrize("sg", PARENTS)
+def test_best_subgroups_for_facets_matches_best_subgroups(tables, sg):
+    O = get_orthogonalization_matrix(*PARENTS[sg]).T
+    hkls = generate_facets(3)
+    table = tables[sg]
+
+    assert table.preserves_metric(O)
+    expected = table.best_subgroups(facet_normals_to_crystal_frame(hkls, O))
+    np.testing.assert_array_equal(table.best_subgroups_for_facets(hkls, O), expected)
+
+
+# refined cells that do not quite keep the symmetry of the parent
+@pytest.mark.parametrize(
+    "sg, cell",
+    [
+        (96, (79.1, 79.12, 38.2, 90.0, 90.0, 90.0)),
+        (146, (103.4, 103.41, 124.9, 90.0, 90.0, 119.99)),
+        (221, (102.6, 102.61, 102.59, 90.0, 90.01, 90.0)),
+    ],
+)
+def test_best_subgroups_for_facets_non_ideal_cell(tables, sg, cell):
+    O = get_orthogonalization_matrix(*cell).T
+    hkls = generate_facets(3)
+    table = tables[sg]
+
+    assert not table.preserves_metric(O)
+    expected = table.best_subgroups(facet_normals_to_crystal_frame(hkls, O))
+    np.testing.assert_array_equal(table.best_subgroups_for_facets(hkls, O), expected)
+
+
+def test_sgdb_matches_cctbx(tables, tmp_path):
+    path = tmp_path / "subgroups.sgdb"
+    write_sgdb(str(path), numbers=list(PARENTS))
+    sgdb = SubgroupDatabase(str(path))
+
+    for sg, table in tables.items():
+        assert sg in sgdb
+        stored = sgdb.get_table(sg)
+        np.testing.assert_array_equal(stored.n_smx, table.n_smx)
+        np.testing.assert_array_equal(stored.rotations, table.rotations)
+        assert stored.symbols == table.symbols
+        assert stored.cb_ops == table.cb_ops